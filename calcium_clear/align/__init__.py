@@ -4,20 +4,34 @@ from .align_events import (
     align_to_events_grouped,
     align_to_events_grouped_long,
 )
+from .epochs import Epochs, align_to_events_array
 from .average_trace import (
     average_trace,
     average_trace_long,
     average_trace_grouped,
     average_trace_grouped_long,
 )
+from .streaming import align_to_events_parquet, average_trace_parquet
+from .running_stats import RunningStats, average_trace_stats
+from .online import OnlineAverageTrace
+from .bootstrap import bootstrap_epochs, bootstrap_average_trace
 
 __all__ = [
     "align_to_events",
     "align_to_events_long",
     "align_to_events_grouped",
     "align_to_events_grouped_long",
+    "Epochs",
+    "align_to_events_array",
     "average_trace",
     "average_trace_long",
     "average_trace_grouped",
     "average_trace_grouped_long",
+    "align_to_events_parquet",
+    "average_trace_parquet",
+    "RunningStats",
+    "average_trace_stats",
+    "OnlineAverageTrace",
+    "bootstrap_epochs",
+    "bootstrap_average_trace",
 ]
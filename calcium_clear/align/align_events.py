@@ -1,7 +1,74 @@
+from collections import OrderedDict
+from typing import Optional
 import numpy as np
 import pandas as pd
 from binit import align_around, which_bin_idx
 from joblib import Parallel, delayed
+import hashlib
+import joblib
+import os
+import tempfile
+from .epochs import (
+    _epoch_sample_idx,
+    _sample_period,
+    _sorted_time,
+    align_to_events_array,
+    lag_offsets,
+)
+
+
+def _window_index(
+    time: np.ndarray, events: np.ndarray, t_before: float, t_after: float
+):
+    """
+    Index arrays of every (sample, event) pair with the sample inside the event's window.
+
+    Windows may overlap, in which case a sample is paired with several events.
+    Pairs are ordered by sample, then by event.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: sample indices and event indices.
+    """
+    starts = np.searchsorted(time, events - t_before, side="left")
+    stops = np.searchsorted(time, events + t_after, side="right")
+    lengths = np.maximum(stops - starts, 0)
+
+    event_idx = np.repeat(np.arange(len(events)), lengths)
+    window_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    sample_idx = np.arange(lengths.sum()) - window_starts + np.repeat(starts, lengths)
+
+    order = np.lexsort((event_idx, sample_idx))
+    return sample_idx[order], event_idx[order]
+
+
+def _align_to_events_overlapping(
+    df_wide: pd.DataFrame,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str,
+    created_event_index_col: str,
+    created_aligned_time_col: str,
+    round_precision: int,
+    drop_non_aligned: bool,
+) -> pd.DataFrame:
+    time = df_wide[time_col].to_numpy(dtype=float)
+    sample_idx, event_idx = _window_index(time, events, t_before, t_after)
+    aligned_time = time[sample_idx] - events[event_idx]
+    event_idx = event_idx.astype(float)
+
+    if not drop_non_aligned:
+        non_aligned = np.setdiff1d(np.arange(len(time)), sample_idx)
+        order = np.argsort(np.concatenate([sample_idx, non_aligned]), kind="stable")
+        sample_idx = np.concatenate([sample_idx, non_aligned])[order]
+        nans = np.full(len(non_aligned), np.nan)
+        aligned_time = np.concatenate([aligned_time, nans])[order]
+        event_idx = np.concatenate([event_idx, nans])[order]
+
+    df_aligned = df_wide.iloc[sample_idx]
+    df_aligned[created_aligned_time_col] = np.round(aligned_time, round_precision)
+    df_aligned[created_event_index_col] = event_idx
+    return df_aligned
 
 
 def align_to_events(
@@ -14,6 +81,8 @@ def align_to_events(
     created_aligned_time_col: str = "aligned_time",
     round_precision: int = 1,
     drop_non_aligned: bool = True,
+    method: str = "binit",
+    allow_overlap: bool = False,
 ) -> pd.DataFrame:
     """
     Aligns a dataframe to events, creating a new column with the aligned time
@@ -30,8 +99,41 @@ def align_to_events(
         round_precision: The number of decimal places to round the aligned time to.
         created_aligned_time_col: The name of the new column with the aligned time.
         drop_non_aligned: Whether to drop rows that were not aligned to an event.
+        method: "binit" assigns each row of df_wide to at most one event. "epochs"
+            builds the output from `align_to_events_array`, gathering a fixed
+            window of samples around every event. round_precision is ignored
+            with "epochs" as the aligned time is taken from the shared lag axis.
+        allow_overlap: Only used with method "binit". If True, a row falling in the
+            windows of several events is returned once for each of them, so events
+            closer together than t_before + t_after keep their full windows.
     """
+    if method == "epochs":
+        epochs = align_to_events_array(
+            df_wide, events, t_before=t_before, t_after=t_after, time_col=time_col
+        )
+        return epochs.to_frame(
+            time_col=time_col,
+            created_event_index_col=created_event_index_col,
+            created_aligned_time_col=created_aligned_time_col,
+            drop_non_aligned=drop_non_aligned,
+        )
+    elif method != "binit":
+        raise ValueError(f"method must be one of ['binit', 'epochs'], not {method}")
+
     events = np.asarray(events)
+    if allow_overlap:
+        return _align_to_events_overlapping(
+            df_wide,
+            events,
+            t_before=t_before,
+            t_after=t_after,
+            time_col=time_col,
+            created_event_index_col=created_event_index_col,
+            created_aligned_time_col=created_aligned_time_col,
+            round_precision=round_precision,
+            drop_non_aligned=drop_non_aligned,
+        )
+
     df_wide[created_aligned_time_col] = align_around(
         df_wide[time_col].values, events, t_before=t_before, max_latency=t_after
     )
@@ -61,6 +163,8 @@ def align_to_events_long(
     created_value_col: str = "value",
     round_precision: int = 1,
     drop_non_aligned: bool = True,
+    method: str = "binit",
+    allow_overlap: bool = False,
 ) -> pd.DataFrame:
     """
     Aligns a dataframe to events, creating a new column with the aligned time and returning a long-format dataframe.
@@ -75,6 +179,8 @@ def align_to_events_long(
         round_precision (int): The number of decimal places to round the aligned time to.
         created_aligned_time_col (str): The name of the new column with the aligned time.
         drop_non_aligned (bool): Whether to drop rows that were not aligned to an event.
+        method (str): Alignment method passed to `align_to_events`, either "binit" or "epochs".
+        allow_overlap (bool): Whether a row may be aligned to several events with overlapping windows.
 
     Returns:
         df_long (pd.DataFrame): A long-format dataframe with the aligned time and the index of the event that was aligned to.
@@ -89,6 +195,8 @@ def align_to_events_long(
         created_aligned_time_col=created_aligned_time_col,
         round_precision=round_precision,
         drop_non_aligned=drop_non_aligned,
+        method=method,
+        allow_overlap=allow_overlap,
     )
     df_long = df_aligned.melt(
         id_vars=[
@@ -102,6 +210,230 @@ def align_to_events_long(
     return df_long
 
 
+_ALIGNMENT_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_ALIGNMENT_CACHE_SIZE = 16
+
+
+def _hash_array(arr: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(arr, dtype=float).tobytes()).hexdigest()
+
+
+def _alignment_mapping(
+    time: np.ndarray,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    round_precision: int,
+    time_key: Optional[str] = None,
+    method: str = "binit",
+):
+    """
+    Returns the (rows, aligned_time, event_idx) mapping of `time` to `events`.
+
+    With "binit", every sample is mapped once and aligned_time is NaN for samples
+    outside all windows. With "epochs", every (event, lag) pair of `align_to_events_array`
+    is mapped and rows is -1 for lags outside the recording.
+    Mappings are kept in a bounded LRU cache keyed by a hash of the time vector, a
+    hash of the events and the alignment parameters, so groups sharing a time base
+    and event times are only aligned once.
+
+    Args:
+        time (np.ndarray): Time of every sample.
+        events (np.ndarray): Event times.
+        t_before (float): The time before the event to align to.
+        t_after (float): The time after the event to align to.
+        round_precision (int): The number of decimal places to round the aligned time to.
+        time_key (Optional[str]): Precomputed hash of `time`, to avoid rehashing it.
+        method (str): "binit" or "epochs", as in `align_to_events`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: row of `time`, aligned time and
+        event index of every mapped sample.
+    """
+    if time_key is None:
+        time_key = _hash_array(time)
+    if method == "epochs":
+        round_precision = None
+    key = (time_key, _hash_array(events), t_before, t_after, round_precision, method)
+    if key in _ALIGNMENT_CACHE:
+        _ALIGNMENT_CACHE.move_to_end(key)
+        return _ALIGNMENT_CACHE[key]
+
+    if method == "epochs":
+        dt = _sample_period(time)
+        offsets = lag_offsets(t_before, t_after, dt)
+        rows = _epoch_sample_idx(time, events, dt, offsets).reshape(-1)
+        aligned_time = np.tile(offsets * dt, len(events))
+        event_idx = np.repeat(np.arange(len(events)), len(offsets))
+    else:
+        rows = np.arange(len(time))
+        aligned_time = align_around(
+            time, events, t_before=t_before, max_latency=t_after
+        ).round(round_precision)
+        event_idx = which_bin_idx(
+            time, events, time_before=t_before, time_after=t_after
+        )
+
+    _ALIGNMENT_CACHE[key] = (rows, aligned_time, event_idx)
+    if len(_ALIGNMENT_CACHE) > _ALIGNMENT_CACHE_SIZE:
+        _ALIGNMENT_CACHE.popitem(last=False)
+    return rows, aligned_time, event_idx
+
+
+def _align_group_block(
+    values: np.ndarray,
+    time: np.ndarray,
+    col_idx: np.ndarray,
+    col_names: list,
+    rows: np.ndarray,
+    aligned_time: np.ndarray,
+    event_idx: np.ndarray,
+    time_col: str,
+    created_event_index_col: str,
+    created_aligned_time_col: str,
+) -> pd.DataFrame:
+    """
+    Gathers the columns `col_idx` of a (possibly memory-mapped) trace matrix at `rows`.
+
+    `aligned_time` and `event_idx` hold the alignment of each of `rows`; rows of -1
+    (lags outside the recording) are NaN. Only those rows of the group's columns are
+    read from `values`, so a worker holding a memory-mapped matrix copies no more than
+    its own output.
+    Returns a dataframe in the format of `align_to_events`.
+    """
+    valid = rows >= 0
+    block = values[np.ix_(np.where(valid, rows, 0), col_idx)]
+    block_time = time[np.where(valid, rows, 0)]
+    if not valid.all():
+        block[~valid] = np.nan
+        block_time = np.where(valid, block_time, np.nan)
+    df_group = pd.DataFrame(block, columns=col_names)
+    df_group[time_col] = block_time
+    df_group[created_aligned_time_col] = aligned_time
+    df_group[created_event_index_col] = event_idx
+    return df_group
+
+
+def _melt_group(group, df_group_kwargs: dict, melt_kwargs: dict, group_col: str):
+    df_group = _align_group_block(**df_group_kwargs)
+    return df_group.melt(**melt_kwargs).assign(**{group_col: group})
+
+
+def _wide_group(
+    group, df_group_kwargs: dict, index_cols: list, drop_time_col: bool
+):
+    df_group = _align_group_block(**df_group_kwargs)
+    if drop_time_col:
+        df_group = df_group.drop(columns=[df_group_kwargs["time_col"]])
+    # rows sharing an index after rounding are averaged, as pivot_table would
+    return df_group.groupby(index_cols).mean()
+
+
+def _map_groups(
+    func,
+    df_wide: pd.DataFrame,
+    df_events: pd.DataFrame,
+    df_wide_group_mapper: dict,
+    n_jobs: int,
+    df_wide_time_col: str,
+    df_events_event_time_col: str,
+    df_events_group_col: str,
+    t_before: float,
+    t_after: float,
+    round_precision: int,
+    drop_non_aligned: bool,
+    block_kwargs: dict,
+    func_kwargs: dict,
+    method: str = "binit",
+) -> list:
+    """
+    Runs `func` on every group of df_wide_group_mapper that has events.
+
+    With several jobs, the traces of all grouped columns are written once to a
+    memory-mapped file that workers open read-only; with n_jobs=1 the groups are run
+    in process on the in-memory array. Each group's alignment is looked up in the alignment
+    cache, so groups sharing event times are aligned once. Each task only carries
+    the column indices and aligned rows of its group, so memory does not grow with
+    the number of workers.
+    `func` is called as func(group, df_group_kwargs, **func_kwargs), where
+    df_group_kwargs are the arguments of `_align_group_block` for that group.
+    """
+    col_names = list(
+        dict.fromkeys(
+            c
+            for cols in df_wide_group_mapper.values()
+            for c in cols
+            if c in df_wide.columns and c != df_wide_time_col
+        )
+    )
+    col_pos = {c: i for i, c in enumerate(col_names)}
+    if method not in ("binit", "epochs"):
+        raise ValueError(f"method must be one of ['binit', 'epochs'], not {method}")
+    if method == "epochs":
+        time = _sorted_time(df_wide, df_wide_time_col)
+    else:
+        time = df_wide[df_wide_time_col].to_numpy()
+    time_key = _hash_array(time)
+    events_by_group = {
+        group: df[df_events_event_time_col].values
+        for group, df in df_events.groupby(df_events_group_col, sort=False)
+    }
+
+    group_kwargs = []
+    for group, group_cols in df_wide_group_mapper.items():
+        if group not in events_by_group:
+            continue
+        rows, aligned_time, event_idx = _alignment_mapping(
+            time,
+            events_by_group[group],
+            t_before=t_before,
+            t_after=t_after,
+            round_precision=round_precision,
+            time_key=time_key,
+            method=method,
+        )
+        if drop_non_aligned:
+            keep = rows >= 0 if method == "epochs" else ~np.isnan(aligned_time)
+            rows, aligned_time, event_idx = (
+                rows[keep],
+                aligned_time[keep],
+                event_idx[keep],
+            )
+
+        group_col_names = [c for c in group_cols if c in col_pos]
+        df_group_kwargs = dict(
+            time=time,
+            col_idx=np.array([col_pos[c] for c in group_col_names], dtype=int),
+            col_names=group_col_names,
+            rows=rows,
+            aligned_time=aligned_time,
+            event_idx=event_idx,
+            time_col=df_wide_time_col,
+            **block_kwargs,
+        )
+        group_kwargs.append((group, df_group_kwargs))
+
+    values = df_wide[col_names].to_numpy(dtype=float)
+    if n_jobs == 1:
+        return [
+            func(group, dict(df_group_kwargs, values=values), **func_kwargs)
+            for group, df_group_kwargs in group_kwargs
+        ]
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        values_path = os.path.join(temp_folder, "values.joblib")
+        joblib.dump(values, values_path)
+        values = joblib.load(values_path, mmap_mode="r")
+        try:
+            return Parallel(n_jobs=n_jobs)(
+                delayed(func)(group, dict(df_group_kwargs, values=values), **func_kwargs)
+                for group, df_group_kwargs in group_kwargs
+            )
+        finally:
+            # the memory map must be closed before its directory is removed on Windows
+            del values
+
+
 def align_to_events_grouped_long(
     df_wide: pd.DataFrame,
     df_events: pd.DataFrame,
@@ -118,6 +450,7 @@ def align_to_events_grouped_long(
     created_neuron_col: str = "neuron",
     created_value_col: str = "value",
     drop_non_aligned: bool = True,
+    method: str = "binit",
 ) -> pd.DataFrame:
     """
     Aligns a dataframe to events, creating a new column with the aligned time. Returns a long-format dataframe.
@@ -138,53 +471,38 @@ def align_to_events_grouped_long(
         created_neuron_col (str): The name of the new column with the neuron name.
         created_value_col (str): The name of the new column with the value.
         drop_non_aligned (bool): Whether to drop rows that were not aligned to an event.
+        method (str): Alignment method, "binit" or "epochs", as in `align_to_events`.
+            round_precision is ignored with "epochs".
 
     Returns:
         df_long (pd.DataFrame): A long-format dataframe with the aligned time and the index of the event that was aligned to.
     """
-
-    unique_groups_df = list(df_wide_group_mapper.keys())
-    unique_groups_events = df_events[df_events_group_col].unique()
-
-    def process_group(group):
-        if group not in unique_groups_events:
-            return None
-
-        potential_group_cols = list(df_wide_group_mapper[group]) + [df_wide_time_col]
-
-        df_group = df_wide[
-            [c for c in potential_group_cols if c in df_wide.columns]
-        ].copy()
-
-        df_events_group = df_events.loc[df_events[df_events_group_col] == group].copy()
-
-        df_group = align_to_events(
-            df_group,
-            df_events_group[df_events_event_time_col].values,
-            t_before=t_before,
-            t_after=t_after,
-            round_precision=round_precision,
-            time_col=df_wide_time_col,
-            created_event_index_col=created_event_index_col,
-            created_aligned_time_col=created_aligned_time_col,
-            drop_non_aligned=drop_non_aligned,
-        )
-        df_group = df_group.melt(
-            id_vars=[
-                df_wide_time_col,
-                created_aligned_time_col,
-                created_event_index_col,
-            ],
-            var_name=created_neuron_col,
-            value_name=created_value_col,
-        )
-        df_group = df_group.assign(**{df_events_group_col: group})
-        return df_group
-
-    df_list = Parallel(n_jobs=n_jobs)(
-        delayed(process_group)(group) for group in unique_groups_df
+    block_kwargs = dict(
+        created_event_index_col=created_event_index_col,
+        created_aligned_time_col=created_aligned_time_col,
+    )
+    melt_kwargs = dict(
+        id_vars=[df_wide_time_col, created_aligned_time_col, created_event_index_col],
+        var_name=created_neuron_col,
+        value_name=created_value_col,
+    )
+    df_list = _map_groups(
+        _melt_group,
+        df_wide=df_wide,
+        df_events=df_events,
+        df_wide_group_mapper=df_wide_group_mapper,
+        n_jobs=n_jobs,
+        df_wide_time_col=df_wide_time_col,
+        df_events_event_time_col=df_events_event_time_col,
+        df_events_group_col=df_events_group_col,
+        t_before=t_before,
+        t_after=t_after,
+        round_precision=round_precision,
+        drop_non_aligned=drop_non_aligned,
+        block_kwargs=block_kwargs,
+        func_kwargs=dict(melt_kwargs=melt_kwargs, group_col=df_events_group_col),
+        method=method,
     )
-    df_list = [df for df in df_list if df is not None]
 
     df_long = pd.concat(df_list)
     return df_long
@@ -207,11 +525,14 @@ def align_to_events_grouped(
     created_value_col: str = "value",
     drop_non_aligned: bool = True,
     drop_time_col: bool = True,
+    method: str = "binit",
 ) -> pd.DataFrame:
     """
     Aligns a dataframe of data from multiple groups to a dataframe of events from the corresponding groups.
 
     Data from the data dataframe is aligned to events from the events dataframe based on the group information in both dataframes.
+    Each group is aligned in wide format and the groups are joined column-wise on a shared
+    (aligned_time, event_idx) index, so no long-format intermediate is built.
 
     Args:
         df_wide (pd.DataFrame): A dataframe with a time column.
@@ -230,37 +551,38 @@ def align_to_events_grouped(
         created_value_col (str): The name of the new column with the value.
         drop_non_aligned (bool): Whether to drop rows that were not aligned to an event.
         drop_time_col (bool): Whether to drop the time column from the output dataframe.
+        method (str): Alignment method, "binit" or "epochs", as in `align_to_events`.
+            round_precision is ignored with "epochs".
 
     Returns:
         df_wide (pd.DataFrame): A wide-format dataframe with the aligned time and the index of the event that was aligned to.
     """
-    df_long = align_to_events_grouped_long(
+    index_cols = [created_aligned_time_col, created_event_index_col]
+    if not drop_time_col:
+        index_cols.append(df_wide_time_col)
+
+    block_kwargs = dict(
+        created_event_index_col=created_event_index_col,
+        created_aligned_time_col=created_aligned_time_col,
+    )
+    df_list = _map_groups(
+        _wide_group,
         df_wide=df_wide,
         df_events=df_events,
-        t_before=t_before,
-        t_after=t_after,
         df_wide_group_mapper=df_wide_group_mapper,
-        round_precision=round_precision,
         n_jobs=n_jobs,
         df_wide_time_col=df_wide_time_col,
         df_events_event_time_col=df_events_event_time_col,
         df_events_group_col=df_events_group_col,
-        created_event_index_col=created_event_index_col,
-        created_aligned_time_col=created_aligned_time_col,
-        created_neuron_col=created_neuron_col,
-        created_value_col=created_value_col,
+        t_before=t_before,
+        t_after=t_after,
+        round_precision=round_precision,
         drop_non_aligned=drop_non_aligned,
+        block_kwargs=block_kwargs,
+        func_kwargs=dict(index_cols=index_cols, drop_time_col=drop_time_col),
+        method=method,
     )
-    index_cols = [created_aligned_time_col, created_event_index_col]
-    if not drop_time_col:
-        index_cols.append(df_wide_time_col)
-    return (
-        df_long.pivot_table(
-            index=index_cols,
-            values=created_value_col,
-            columns=created_neuron_col,
-        )
-        .sort_values(by=[created_aligned_time_col, created_event_index_col])
-        .reset_index()
-        .rename_axis(None, axis=1)
-    )
+
+    df_aligned = pd.concat(df_list, axis=1).sort_index().sort_index(axis=1)
+    df_aligned = df_aligned.dropna(axis=0, how="all").dropna(axis=1, how="all")
+    return df_aligned.reset_index().rename_axis(None, axis=1)
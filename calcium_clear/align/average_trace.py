@@ -1,7 +1,92 @@
 from .align_events import align_to_events, align_to_events_grouped
+from .epochs import Epochs, align_to_events_array
+from calcium_clear.stats.reducers import is_reducer
 import numpy as np
 import pandas as pd
-from typing import Union, Callable
+import warnings
+from typing import List, Union, Callable
+
+
+def _nansem(arr: np.ndarray, axis: int = 0) -> np.ndarray:
+    count = np.sum(~np.isnan(arr), axis=axis)
+    return np.nanstd(arr, axis=axis, ddof=1) / np.sqrt(count)
+
+
+_EPOCH_AGG_FUNCS = {
+    "mean": np.nanmean,
+    "median": np.nanmedian,
+    "std": lambda arr, axis: np.nanstd(arr, axis=axis, ddof=1),
+    "var": lambda arr, axis: np.nanvar(arr, axis=axis, ddof=1),
+    "sem": _nansem,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "sum": np.nansum,
+    "count": lambda arr, axis: np.sum(~np.isnan(arr), axis=axis),
+}
+
+
+def _check_event_agg_func(agg_func: Union[str, Callable]):
+    """
+    Rejects registered lag-axis reducers, e.g. "peak_latency" or "auc".
+
+    They measure a response along the lags of one trace and have no meaning across events.
+    """
+    if is_reducer(agg_func) and agg_func not in _EPOCH_AGG_FUNCS:
+        raise ValueError(
+            f"'{agg_func}' reduces a trace over its lags and cannot aggregate across events. "
+            f"Use one of {list(_EPOCH_AGG_FUNCS)} or a callable."
+        )
+
+
+def _agg_over_events(
+    df_aligned: pd.DataFrame,
+    created_aligned_time_col: str,
+    drop_cols: List[str],
+    agg_func: Union[str, Callable],
+) -> pd.DataFrame:
+    """Aggregates an aligned wide dataframe over events, one row per aligned time."""
+    _check_event_agg_func(agg_func)
+    return (
+        df_aligned.drop(columns=drop_cols)
+        .groupby(created_aligned_time_col)
+        .agg(agg_func)
+        .reset_index()
+    )
+
+
+def _average_epochs(
+    epochs: Epochs,
+    time_col: str,
+    created_aligned_time_col: str,
+    agg_func: Union[str, Callable],
+) -> pd.DataFrame:
+    """
+    Reduces an epoch tensor over its event axis, one row per lag.
+
+    Built-in string aggregations are NaN-aware reductions over the event axis.
+    Other aggregations fall back to a groupby on the lag of the tensor's frame view.
+    """
+    _check_event_agg_func(agg_func)
+    has_data = epochs.valid.any(axis=0)
+    if isinstance(agg_func, str) and agg_func in _EPOCH_AGG_FUNCS:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            reduced = _EPOCH_AGG_FUNCS[agg_func](epochs.data[:, has_data], axis=0)
+        df_average_trace = pd.DataFrame(reduced, columns=epochs.neurons)
+        df_average_trace.insert(
+            0, created_aligned_time_col, epochs.lags[has_data]
+        )
+        return df_average_trace
+
+    df_aligned = epochs.to_frame(
+        time_col=time_col, created_aligned_time_col=created_aligned_time_col
+    )
+    df_average_trace = (
+        df_aligned.drop(["event_idx", time_col], axis=1)
+        .groupby(created_aligned_time_col)
+        .agg(agg_func)
+    )
+    return df_average_trace.reset_index().rename_axis(None, axis=1)
 
 
 def average_trace(
@@ -13,6 +98,8 @@ def average_trace(
     created_aligned_time_col: str = "aligned_time",
     round_precision: int = 1,
     agg_func: Union[str, Callable] = "mean",
+    method: str = "binit",
+    allow_overlap: bool = False,
 ) -> pd.DataFrame:
     """
     Aligns traces to events and averages them.
@@ -25,11 +112,25 @@ def average_trace(
         time_col (str, optional): name of time column. Defaults to "time".
         created_aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
         round_precision (int, optional): precision to round to. Defaults to 1.
-        agg_func (Union[str, Callable], optional): aggregation function to use. Defaults to "mean".
+        agg_func (Union[str, Callable], optional): aggregation function to use across events. Registered
+            lag-axis reducers such as "peak_latency" are rejected. Defaults to "mean".
+        method (str, optional): "binit" groups rows on their rounded aligned time. "epochs" snaps
+            events to their nearest sample and reduces the epoch tensor over its event axis, with
+            one row per integer lag. round_precision is ignored with "epochs". Defaults to "binit".
+        allow_overlap (bool, optional): whether samples may count towards several events with overlapping
+            windows when method is "binit". Windows always overlap with "epochs". Defaults to False.
 
     Returns:
         pd.DataFrame: dataframe with average trace
     """
+    if method == "epochs":
+        epochs = align_to_events_array(
+            df_wide, events, t_before=t_before, t_after=t_after, time_col=time_col
+        )
+        return _average_epochs(epochs, time_col, created_aligned_time_col, agg_func)
+    elif method != "binit":
+        raise ValueError(f"method must be one of ['binit', 'epochs'], not {method}")
+
     df_aligned = align_to_events(
         df_wide,
         events=events,
@@ -40,14 +141,14 @@ def average_trace(
         round_precision=round_precision,
         created_aligned_time_col=created_aligned_time_col,
         drop_non_aligned=True,
+        allow_overlap=allow_overlap,
     )
-    df_average_trace = (
-        df_aligned.drop(["event_idx", time_col], axis=1)
-        .groupby(created_aligned_time_col)
-        .agg(agg_func)
+    return _agg_over_events(
+        df_aligned,
+        created_aligned_time_col,
+        drop_cols=["event_idx", time_col],
+        agg_func=agg_func,
     )
-    df_average_trace = df_average_trace.reset_index()
-    return df_average_trace
 
 
 def average_trace_long(
@@ -61,6 +162,8 @@ def average_trace_long(
     created_value_col: str = "value",
     round_precision: int = 1,
     agg_func: Union[str, Callable] = "mean",
+    method: str = "binit",
+    allow_overlap: bool = False,
 ) -> pd.DataFrame:
     """
     Aligns traces to events and averages them, returning a long-format dataframe.
@@ -76,6 +179,8 @@ def average_trace_long(
         created_value_col (str, optional): name of value column. Defaults to "value".
         round_precision (int, optional): precision to round to. Defaults to 1.
         agg_func (Union[str, Callable], optional): aggregation function to use. Defaults to "mean".
+        method (str, optional): alignment method passed to `average_trace`. Defaults to "binit".
+        allow_overlap (bool, optional): whether windows of nearby events may overlap. Defaults to False.
 
     Returns:
         pd.DataFrame: dataframe with average trace in long format.
@@ -89,6 +194,8 @@ def average_trace_long(
         created_aligned_time_col=created_aligned_time_col,
         round_precision=round_precision,
         agg_func=agg_func,
+        method=method,
+        allow_overlap=allow_overlap,
     )
     df_long = df_average_trace.melt(
         id_vars=[created_aligned_time_col],
@@ -112,6 +219,7 @@ def average_trace_grouped(
     df_events_group_col: str = "group",
     created_aligned_time_col: str = "aligned_time",
     agg_func: Union[str, Callable] = "mean",
+    method: str = "binit",
 ) -> pd.DataFrame:
     """
     Aligns and averages a dataframe of traces to a dataframe of events with each dataframe containing multiple groups.
@@ -131,6 +239,7 @@ def average_trace_grouped(
         df_events_group_col (str, optional): name of group column in events dataframe. Defaults to "group".
         created_aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
         agg_func (Union[str, Callable], optional): aggregation function to use. Defaults to "mean".
+        method (str, optional): alignment method passed to `align_to_events_grouped`. Defaults to "binit".
 
     Returns:
         pd.DataFrame: dataframe with average trace (wide format)
@@ -148,14 +257,14 @@ def average_trace_grouped(
         df_events_group_col=df_events_group_col,
         created_aligned_time_col=created_aligned_time_col,
         drop_time_col=True,
+        method=method,
     )
-    df_average_trace = (
-        df_aligned.drop(["event_idx"], axis=1)
-        .groupby(created_aligned_time_col)
-        .agg(agg_func)
+    return _agg_over_events(
+        df_aligned,
+        created_aligned_time_col,
+        drop_cols=["event_idx"],
+        agg_func=agg_func,
     )
-    df_average_trace = df_average_trace.reset_index()
-    return df_average_trace
 
 
 def average_trace_grouped_long(
@@ -173,6 +282,7 @@ def average_trace_grouped_long(
     df_events_group_col: str = "group",
     created_aligned_time_col: str = "aligned_time",
     agg_func: Union[str, Callable] = "mean",
+    method: str = "binit",
 ) -> pd.DataFrame:
     """
     ligns and averages a dataframe of traces to a dataframe of events with each dataframe containing multiple groups. Returns a long-format dataframe.
@@ -194,6 +304,7 @@ def average_trace_grouped_long(
         df_events_group_col (str, optional): name of group column in events dataframe. Defaults to "group".
         created_aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
         agg_func (Union[str, Callable], optional): aggregation function to use. Defaults to "mean".
+        method (str, optional): alignment method passed to `align_to_events_grouped`. Defaults to "binit".
 
     Returns:
         pd.DataFrame: dataframe with average trace (long format)
@@ -211,6 +322,7 @@ def average_trace_grouped_long(
         df_events_group_col=df_events_group_col,
         created_aligned_time_col=created_aligned_time_col,
         agg_func=agg_func,
+        method=method,
     )
 
     df_long = df_average_trace.melt(
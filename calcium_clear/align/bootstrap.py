@@ -0,0 +1,132 @@
+from typing import Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from .epochs import Epochs, align_to_events_array
+
+
+def bootstrap_epochs(
+    epochs: Epochs,
+    n_boot: int = 1000,
+    ci: float = 0.95,
+    chunk_size: Optional[int] = None,
+    random_state: Optional[Union[int, np.random.Generator]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bootstrap confidence bands of the event-triggered average of an epoch tensor.
+
+    All resamples of event indices are drawn as one (n_boot, n_events) integer matrix
+    and turned into per-event counts, so every bootstrap mean is a weighted sum over
+    events computed with one matrix product. NaN lags are excluded from each mean.
+
+    Args:
+        epochs (Epochs): aligned traces from `align_to_events_array`.
+        n_boot (int, optional): number of bootstrap resamples. Defaults to 1000.
+        ci (float, optional): width of the confidence interval. Defaults to 0.95.
+        chunk_size (Optional[int], optional): number of (lag, neuron) pairs processed at once,
+            capping memory at n_boot x chunk_size bootstrap means and n_events x chunk_size
+            float64 values. Defaults to all pairs.
+        random_state (Optional[Union[int, np.random.Generator]], optional): seed or generator. Defaults to None.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: mean, lower and upper bands, each (n_lags, n_neurons).
+    """
+    rng = np.random.default_rng(random_state)
+    n_events, n_lags, n_neurons = epochs.data.shape
+    flat = epochs.data.reshape(n_events, n_lags * n_neurons)
+
+    resamples = rng.integers(0, n_events, size=(n_boot, n_events))
+    offsets = (np.arange(n_boot) * n_events)[:, None]
+    weights = np.bincount(
+        (resamples + offsets).reshape(-1), minlength=n_boot * n_events
+    ).reshape(n_boot, n_events)
+    weights = weights.astype(float)
+
+    if chunk_size is None:
+        chunk_size = flat.shape[1]
+    alpha = (1 - ci) / 2
+    mean = np.empty(flat.shape[1])
+    lower = np.empty(flat.shape[1])
+    upper = np.empty(flat.shape[1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for start in range(0, flat.shape[1], chunk_size):
+            cols = slice(start, start + chunk_size)
+            chunk = flat[:, cols]
+            is_valid = ~np.isnan(chunk)
+            values = np.where(is_valid, chunk, 0).astype(float)
+            is_valid = is_valid.astype(float)
+            boot_means = (weights @ values) / (weights @ is_valid)
+            lower[cols], upper[cols] = _nanquantiles(boot_means, [alpha, 1 - alpha])
+            mean[cols] = values.sum(axis=0) / is_valid.sum(axis=0)
+
+    shape = (n_lags, n_neurons)
+    return mean.reshape(shape), lower.reshape(shape), upper.reshape(shape)
+
+
+def _nanquantiles(arr: np.ndarray, q: Sequence[float]) -> np.ndarray:
+    if not np.isnan(arr).any():
+        return np.quantile(arr, q, axis=0)
+    out = np.full((len(q), arr.shape[1]), np.nan)
+    has_data = ~np.isnan(arr).all(axis=0)
+    out[:, has_data] = np.nanquantile(arr[:, has_data], q, axis=0)
+    return out
+
+
+def bootstrap_average_trace(
+    df_wide: pd.DataFrame,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    n_boot: int = 1000,
+    ci: float = 0.95,
+    time_col: str = "time",
+    neuron_cols: Optional[Sequence[str]] = None,
+    chunk_size: Optional[int] = None,
+    random_state: Optional[Union[int, np.random.Generator]] = None,
+    created_aligned_time_col: str = "aligned_time",
+    created_neuron_col: str = "neuron",
+) -> pd.DataFrame:
+    """
+    Aligns traces to events once and computes bootstrap confidence bands of their average.
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with traces
+        events (np.ndarray): array of events to align to
+        t_before (float): time before event to align to
+        t_after (float): time after event to align to
+        n_boot (int, optional): number of bootstrap resamples of events. Defaults to 1000.
+        ci (float, optional): width of the confidence interval. Defaults to 0.95.
+        time_col (str, optional): name of time column. Defaults to "time".
+        neuron_cols (Optional[Sequence[str]], optional): columns to align. Defaults to all columns except time_col.
+        chunk_size (Optional[int], optional): number of (lag, neuron) pairs processed at once. Defaults to all pairs.
+        random_state (Optional[Union[int, np.random.Generator]], optional): seed or generator. Defaults to None.
+        created_aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
+        created_neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+
+    Returns:
+        pd.DataFrame: long-format dataframe with mean, lower and upper columns per (aligned time, neuron).
+    """
+    epochs = align_to_events_array(
+        df_wide,
+        events,
+        t_before=t_before,
+        t_after=t_after,
+        time_col=time_col,
+        neuron_cols=neuron_cols,
+    )
+    mean, lower, upper = bootstrap_epochs(
+        epochs,
+        n_boot=n_boot,
+        ci=ci,
+        chunk_size=chunk_size,
+        random_state=random_state,
+    )
+    n_lags, n_neurons = mean.shape
+    return pd.DataFrame(
+        {
+            created_aligned_time_col: np.repeat(epochs.lags, n_neurons),
+            created_neuron_col: np.tile(epochs.neurons, n_lags),
+            "mean": mean.reshape(-1),
+            "lower": lower.reshape(-1),
+            "upper": upper.reshape(-1),
+        }
+    )
@@ -0,0 +1,195 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class Epochs:
+    """
+    Traces aligned to events as a dense (n_events, n_lags, n_neurons) tensor.
+
+    Attributes:
+        data (np.ndarray): Aligned traces with shape (n_events, n_lags, n_neurons).
+            Lags falling outside the recording are NaN.
+        lags (np.ndarray): Aligned time of each lag, shape (n_lags,).
+        neurons (np.ndarray): Neuron (column) names, shape (n_neurons,).
+        events (np.ndarray): Event times, shape (n_events,).
+        sample_idx (np.ndarray): Row of the recording gathered for each (event, lag),
+            shape (n_events, n_lags). -1 where the lag falls outside the recording.
+        times (np.ndarray): Recording time of each (event, lag), shape (n_events, n_lags).
+            NaN where the lag falls outside the recording.
+    """
+
+    data: np.ndarray
+    lags: np.ndarray
+    neurons: np.ndarray
+    events: np.ndarray
+    sample_idx: np.ndarray
+    times: np.ndarray
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Boolean mask of shape (n_events, n_lags) marking lags inside the recording."""
+        return self.sample_idx >= 0
+
+    def to_frame(
+        self,
+        time_col: str = "time",
+        created_event_index_col: str = "event_idx",
+        created_aligned_time_col: str = "aligned_time",
+        drop_non_aligned: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Converts the tensor to a wide dataframe in the format returned by `align_to_events`.
+
+        Args:
+            time_col (str): The name of the created time column.
+            created_event_index_col (str): The name of the created event index column.
+            created_aligned_time_col (str): The name of the created aligned time column.
+            drop_non_aligned (bool): Whether to drop lags falling outside the recording.
+
+        Returns:
+            pd.DataFrame: A wide dataframe with one row per (event, lag).
+        """
+        n_events, n_lags, n_neurons = self.data.shape
+        values = self.data.reshape(n_events * n_lags, n_neurons)
+        df = pd.DataFrame(values, columns=self.neurons)
+        df.insert(0, time_col, self.times.reshape(-1))
+        df[created_aligned_time_col] = np.tile(self.lags, n_events)
+        df[created_event_index_col] = np.repeat(np.arange(n_events), n_lags)
+        if drop_non_aligned:
+            df = df.loc[self.valid.reshape(-1)].reset_index(drop=True)
+        return df
+
+
+def _sorted_time(df_wide: pd.DataFrame, time_col: str) -> np.ndarray:
+    time = df_wide[time_col].to_numpy(dtype=float)
+    if len(time) > 1 and np.any(np.diff(time) <= 0):
+        raise ValueError(f"'{time_col}' must be strictly increasing.")
+    return time
+
+
+def _sample_period(time: np.ndarray) -> float:
+    if len(time) < 2:
+        raise ValueError("At least two samples are needed to infer the sample period.")
+    return float(np.median(np.diff(time)))
+
+
+def _event_sample_idx(time: np.ndarray, events: np.ndarray, dt: float) -> np.ndarray:
+    """
+    Index of the sample nearest to each event.
+
+    Events before the first or after the last sample are extrapolated onto the
+    sample grid, so their windows can still partially overlap the recording.
+    """
+    n = len(time)
+    idx = np.searchsorted(time, events, side="left")
+    inner = np.clip(idx, 1, n - 1)
+    closer_left = (events - time[inner - 1]) < (time[inner] - events)
+    idx = inner - closer_left
+    before = events < time[0]
+    after = events > time[-1]
+    idx[before] = np.rint((events[before] - time[0]) / dt).astype(int)
+    idx[after] = n - 1 + np.rint((events[after] - time[-1]) / dt).astype(int)
+    return idx
+
+
+def _epoch_sample_idx(
+    time: np.ndarray, events: np.ndarray, dt: float, offsets: np.ndarray
+) -> np.ndarray:
+    """Row of the recording at every (event, lag), or -1 where the lag falls outside it."""
+    sample_idx = _event_sample_idx(time, events, dt)[:, None] + offsets[None, :]
+    valid = (sample_idx >= 0) & (sample_idx < len(time))
+    return np.where(valid, sample_idx, -1)
+
+
+def lag_offsets(t_before: float, t_after: float, dt: float) -> np.ndarray:
+    """
+    Integer sample offsets spanning [-t_before, t_after] for a sample period dt.
+
+    Args:
+        t_before (float): The time before the event.
+        t_after (float): The time after the event.
+        dt (float): The sample period.
+
+    Returns:
+        np.ndarray: Integer offsets relative to the event sample.
+    """
+    return np.arange(-int(round(t_before / dt)), int(round(t_after / dt)) + 1)
+
+
+def align_to_events_array(
+    df_wide: pd.DataFrame,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str = "time",
+    neuron_cols: Optional[Sequence[str]] = None,
+    dtype: np.dtype = np.float32,
+) -> Epochs:
+    """
+    Aligns traces to events, returning a dense (n_events, n_lags, n_neurons) tensor.
+
+    Each event is snapped to its nearest sample and the window around it is
+    gathered with integer sample offsets, so every event shares the same lag axis
+    and no rounding of aligned times is needed. The sample period is taken as the
+    median difference of the time column.
+
+    Args:
+        df_wide (pd.DataFrame): A dataframe with a time column.
+        events (np.ndarray): A numpy array of event times.
+        t_before (float): The time before the event to align to.
+        t_after (float): The time after the event to align to.
+        time_col (str): The name of the time column in df_wide.
+        neuron_cols (Optional[Sequence[str]]): Columns to align. Defaults to all columns except time_col.
+        dtype (np.dtype): dtype of the returned tensor. Defaults to float32.
+
+    Returns:
+        Epochs: The aligned tensor with its lag, neuron and event axes.
+    """
+    events = np.asarray(events, dtype=float)
+    time = _sorted_time(df_wide, time_col)
+    dt = _sample_period(time)
+    if neuron_cols is None:
+        neuron_cols = [c for c in df_wide.columns if c != time_col]
+    neuron_cols = list(neuron_cols)
+
+    offsets = lag_offsets(t_before, t_after, dt)
+    return _gather_epochs(df_wide[neuron_cols], time, dt, events, offsets, dtype)
+
+
+def _gather_epochs(
+    traces: pd.DataFrame,
+    time: np.ndarray,
+    dt: float,
+    events: np.ndarray,
+    offsets: np.ndarray,
+    dtype: np.dtype,
+) -> Epochs:
+    """
+    Gathers the windows of `events` from the trace columns of a recording.
+
+    Columns are gathered one at a time straight into the preallocated output, so no
+    full copy of the recording or float64 intermediate of the output is built.
+    """
+    sample_idx = _epoch_sample_idx(time, events, dt, offsets)
+    valid = sample_idx >= 0
+
+    rows = np.where(valid, sample_idx, 0).reshape(-1)
+    data = np.empty((len(rows), traces.shape[1]), dtype=dtype)
+    for j in range(traces.shape[1]):
+        column = traces.iloc[:, j].to_numpy(dtype=dtype)
+        np.take(column, rows, out=data[:, j], mode="clip")
+    data[~valid.reshape(-1)] = np.nan
+    data = data.reshape(len(events), len(offsets), traces.shape[1])
+    times = np.where(valid, time[rows].reshape(valid.shape), np.nan)
+
+    return Epochs(
+        data=data,
+        lags=offsets * dt,
+        neurons=np.asarray(traces.columns, dtype=object),
+        events=events,
+        sample_idx=sample_idx,
+        times=times,
+    )
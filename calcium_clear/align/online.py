@@ -0,0 +1,190 @@
+from typing import Optional
+import numpy as np
+import pandas as pd
+from .epochs import _event_sample_idx, lag_offsets
+from .running_stats import RunningStats
+
+
+class OnlineAverageTrace:
+    """
+    Event-triggered average that is updated incrementally as frames and events arrive.
+
+    Events are snapped to their nearest sample and windows are taken on the integer
+    lag grid used by `align_to_events_array`. An event's window is added to the
+    running statistics once a frame at or after `event + t_after` has been appended.
+    Only the frames still needed by pending or future events are kept, so each update
+    costs time proportional to the window length rather than the session length.
+
+    Frames are retained from `t_before` before the start of the latest appended chunk,
+    extended by `max_latency`. Events may therefore be added up to `max_latency` after
+    the first frame of the latest chunk. Adding an event whose window starts before the
+    retained frames raises a ValueError rather than averaging a truncated window.
+
+    Args:
+        t_before (float): time before event to align to
+        t_after (float): time after event to align to
+        dt (Optional[float]): sample period. Inferred from the first appended frames if None.
+        time_col (str): name of the time column of appended frames. Defaults to "time".
+        max_latency (float): how long before the latest chunk events may still be added. Defaults to 0.
+
+    Example:
+        >>> online = OnlineAverageTrace(t_before=1, t_after=2)
+        >>> online.append_frames(df_chunk)
+        >>> online.add_events([12.5, 20.1])
+        >>> online.average  # (n_lags, n_neurons) array
+    """
+
+    def __init__(
+        self,
+        t_before: float,
+        t_after: float,
+        dt: Optional[float] = None,
+        time_col: str = "time",
+        max_latency: float = 0,
+    ):
+        self.t_before = t_before
+        self.t_after = t_after
+        self.dt = dt
+        self.time_col = time_col
+        self.max_latency = max_latency
+        self.neurons = None
+        self.n_events = 0
+        self._time = np.empty(0)
+        self._values = None
+        self._pending = np.empty(0)
+        self._stats = None
+        self._chunk_start = None
+        self._discarded_until = -np.inf
+
+    @property
+    def lags(self) -> np.ndarray:
+        """Aligned time of each lag."""
+        return lag_offsets(self.t_before, self.t_after, self.dt) * self.dt
+
+    def append_frames(self, df_frames: pd.DataFrame) -> "OnlineAverageTrace":
+        """
+        Appends newly acquired frames and completes any events whose window has passed.
+
+        Args:
+            df_frames (pd.DataFrame): wide dataframe of new frames, with a time column
+                later than all previously appended frames.
+
+        Returns:
+            OnlineAverageTrace: self, to allow chaining.
+        """
+        time = df_frames[self.time_col].to_numpy(dtype=float)
+        if len(self._time) and len(time) and time[0] <= self._time[-1]:
+            raise ValueError("Appended frames must be later than previous frames.")
+        if self.neurons is None:
+            self.neurons = np.asarray(
+                [c for c in df_frames.columns if c != self.time_col], dtype=object
+            )
+            self._values = np.empty((0, len(self.neurons)))
+        values = df_frames[list(self.neurons)].to_numpy(dtype=float)
+        if len(time):
+            self._chunk_start = time[0]
+
+        self._time = np.concatenate([self._time, time])
+        self._values = np.concatenate([self._values, values])
+        if self.dt is None and len(self._time) > 1:
+            self.dt = float(np.median(np.diff(self._time)))
+        self._update()
+        return self
+
+    def add_events(self, events: np.ndarray) -> "OnlineAverageTrace":
+        """
+        Registers event times. Their windows are averaged once enough frames have arrived.
+
+        Args:
+            events (np.ndarray): event times
+
+        Returns:
+            OnlineAverageTrace: self, to allow chaining.
+
+        Raises:
+            ValueError: If the window of an event starts before the retained frames.
+        """
+        events = np.asarray(events, dtype=float).reshape(-1)
+        margin = self.dt if self.dt is not None else 0
+        if np.any(events - self.t_before - margin <= self._discarded_until):
+            raise ValueError(
+                "The window of an event starts before the retained frames. "
+                "Add events sooner or increase max_latency."
+            )
+        self._pending = np.sort(np.concatenate([self._pending, events]))
+        self._update()
+        return self
+
+    def _update(self):
+        if self.dt is None or self.neurons is None or not len(self._time):
+            return
+        if self._stats is None:
+            self._offsets = lag_offsets(self.t_before, self.t_after, self.dt)
+            self._stats = RunningStats((len(self._offsets), len(self.neurons)))
+
+        ready = self._pending + self.t_after <= self._time[-1]
+        if ready.any():
+            events = self._pending[ready]
+            self._pending = self._pending[~ready]
+
+            sample_idx = (
+                _event_sample_idx(self._time, events, self.dt)[:, None]
+                + self._offsets[None, :]
+            )
+            valid = (sample_idx >= 0) & (sample_idx < len(self._time))
+            windows = self._values[np.where(valid, sample_idx, 0)]
+            windows[~valid] = np.nan
+            self._stats.update(windows)
+            self.n_events += len(events)
+
+        # keep frames needed by pending events and by events that may still arrive
+        horizon = self._chunk_start - self.max_latency - self.t_before
+        if len(self._pending):
+            horizon = min(horizon, self._pending[0] - self.t_before)
+        keep_from = max(np.searchsorted(self._time, horizon - self.dt) - 1, 0)
+        if keep_from:
+            self._discarded_until = self._time[keep_from - 1]
+        self._time = self._time[keep_from:]
+        self._values = self._values[keep_from:]
+
+    @property
+    def average(self) -> Optional[np.ndarray]:
+        """Current (n_lags, n_neurons) average over completed events, or None before any frames."""
+        if self._stats is None:
+            return None
+        return self._stats.result("mean")
+
+    def result(self, stat: str = "mean") -> Optional[np.ndarray]:
+        """
+        Returns a statistic over completed events, see `RunningStats.result`.
+
+        Args:
+            stat (str): name of the statistic. Defaults to "mean".
+
+        Returns:
+            Optional[np.ndarray]: (n_lags, n_neurons) array, or None before any frames.
+        """
+        if self._stats is None:
+            return None
+        return self._stats.result(stat)
+
+    def to_frame(
+        self,
+        stat: str = "mean",
+        created_aligned_time_col: str = "aligned_time",
+    ) -> pd.DataFrame:
+        """
+        Returns a statistic over completed events in the wide format of `average_trace`.
+
+        Args:
+            stat (str): name of the statistic. Defaults to "mean".
+            created_aligned_time_col (str): name of aligned time column. Defaults to "aligned_time".
+
+        Returns:
+            pd.DataFrame: dataframe with one row per lag and one column per neuron.
+        """
+        if self._stats is None:
+            raise ValueError("No frames have been appended yet.")
+        df = pd.DataFrame(self.result(stat), columns=self.neurons)
+        df.insert(0, created_aligned_time_col, self.lags)
+        return df
@@ -0,0 +1,157 @@
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .epochs import _gather_epochs, _sample_period, _sorted_time, lag_offsets
+
+
+class RunningStats:
+    """
+    Streaming per-element count, mean, variance, min and max over batches of samples.
+
+    Batches are merged with the parallel form of Welford's algorithm (Chan et al.),
+    so statistics are exact after a single pass and only O(shape) memory is kept.
+    NaN values are ignored.
+
+    Args:
+        shape (Tuple[int, ...]): Shape of a single sample, e.g. (n_lags, n_neurons).
+    """
+
+    def __init__(self, shape: Tuple[int, ...]):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def update(self, batch: np.ndarray) -> "RunningStats":
+        """
+        Adds a batch of samples stacked along the first axis.
+
+        Args:
+            batch (np.ndarray): Array of shape (n_samples, *shape).
+
+        Returns:
+            RunningStats: self, to allow chaining.
+        """
+        batch = np.asarray(batch, dtype=float)
+        is_valid = ~np.isnan(batch)
+        count_b = is_valid.sum(axis=0)
+        if not count_b.any():
+            return self
+
+        safe_count_b = np.maximum(count_b, 1)
+        mean_b = np.where(is_valid, batch, 0).sum(axis=0) / safe_count_b
+        m2_b = np.where(is_valid, (batch - mean_b) ** 2, 0).sum(axis=0)
+
+        count = self.count + count_b
+        safe_count = np.maximum(count, 1)
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * count_b / safe_count
+        self.m2 = self.m2 + m2_b + delta**2 * self.count * count_b / safe_count
+        self.count = count
+
+        self.min = np.fmin(self.min, np.where(is_valid, batch, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(is_valid, batch, -np.inf).max(axis=0))
+        return self
+
+    def _where_counted(self, arr: np.ndarray, min_count: int = 1) -> np.ndarray:
+        return np.where(self.count >= min_count, arr, np.nan)
+
+    @property
+    def var(self) -> np.ndarray:
+        """Sample variance (ddof=1)."""
+        return self._where_counted(self.m2 / np.maximum(self.count - 1, 1), 2)
+
+    @property
+    def std(self) -> np.ndarray:
+        """Sample standard deviation (ddof=1)."""
+        return np.sqrt(self.var)
+
+    @property
+    def sem(self) -> np.ndarray:
+        """Standard error of the mean."""
+        return self.std / np.sqrt(np.maximum(self.count, 1))
+
+    def result(self, stat: str) -> np.ndarray:
+        """
+        Returns one statistic by name.
+
+        Args:
+            stat (str): One of "mean", "std", "var", "sem", "count", "min" or "max".
+
+        Returns:
+            np.ndarray: The statistic, NaN where no samples were counted.
+        """
+        if stat == "count":
+            return self.count
+        elif stat == "mean":
+            return self._where_counted(self.mean)
+        elif stat in ("std", "var", "sem"):
+            return getattr(self, stat)
+        elif stat in ("min", "max"):
+            return self._where_counted(getattr(self, stat))
+        raise ValueError(
+            "stat must be one of ['mean', 'std', 'var', 'sem', 'count', 'min', 'max'], "
+            f"not {stat}"
+        )
+
+
+def average_trace_stats(
+    df_wide: pd.DataFrame,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str = "time",
+    neuron_cols: Optional[Sequence[str]] = None,
+    stats: Sequence[str] = ("mean", "std", "sem", "count", "min", "max"),
+    batch_size: int = 64,
+    created_aligned_time_col: str = "aligned_time",
+    created_neuron_col: str = "neuron",
+) -> pd.DataFrame:
+    """
+    Computes several peri-event statistics of traces in a single streaming pass over events.
+
+    Events are aligned in batches of `batch_size` on the integer lag grid of
+    `align_to_events_array` and merged into a `RunningStats` accumulator, so the
+    aligned data is never materialized in full and memory is O(n_lags x n_neurons).
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with traces
+        events (np.ndarray): array of events to align to
+        t_before (float): time before event to align to
+        t_after (float): time after event to align to
+        time_col (str, optional): name of time column. Defaults to "time".
+        neuron_cols (Optional[Sequence[str]], optional): columns to summarize. Defaults to all columns except time_col.
+        stats (Sequence[str], optional): statistics to return, see `RunningStats.result`.
+            Defaults to ("mean", "std", "sem", "count", "min", "max").
+        batch_size (int, optional): number of events aligned at a time. Defaults to 64.
+        created_aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
+        created_neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+
+    Returns:
+        pd.DataFrame: long-format dataframe with one row per (aligned time, neuron) and one column per statistic.
+    """
+    events = np.asarray(events, dtype=float)
+    time = _sorted_time(df_wide, time_col)
+    dt = _sample_period(time)
+    if neuron_cols is None:
+        neuron_cols = [c for c in df_wide.columns if c != time_col]
+    traces = df_wide[list(neuron_cols)]
+    offsets = lag_offsets(t_before, t_after, dt)
+
+    running = RunningStats((len(offsets), traces.shape[1]))
+    for start in range(0, len(events), batch_size):
+        epochs = _gather_epochs(
+            traces, time, dt, events[start : start + batch_size], offsets, np.float64
+        )
+        running.update(epochs.data)
+
+    df_stats = pd.DataFrame(
+        {
+            created_aligned_time_col: np.repeat(offsets * dt, traces.shape[1]),
+            created_neuron_col: np.tile(np.asarray(traces.columns), len(offsets)),
+        }
+    )
+    for stat in stats:
+        df_stats[stat] = running.result(stat).reshape(-1)
+    return df_stats
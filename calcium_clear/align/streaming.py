@@ -0,0 +1,284 @@
+from typing import Callable, Iterator, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from .align_events import align_to_events
+from .average_trace import _agg_over_events, _check_event_agg_func
+
+
+def _row_group_bounds(pf: pq.ParquetFile, time_col: str) -> np.ndarray:
+    """
+    Returns the (min, max) time of every row group of a Parquet file.
+
+    Row-group statistics are used where the file has them, otherwise only the time
+    column of the row group is read.
+    """
+    col_pos = pf.schema_arrow.get_field_index(time_col)
+    bounds = np.empty((pf.num_row_groups, 2))
+    for i in range(pf.num_row_groups):
+        stats = pf.metadata.row_group(i).column(col_pos).statistics
+        if stats is not None and stats.has_min_max:
+            bounds[i] = stats.min, stats.max
+        else:
+            time = pf.read_row_group(i, columns=[time_col]).column(0).to_numpy()
+            bounds[i] = time.min(), time.max()
+    return bounds
+
+
+def _event_clusters(
+    events: np.ndarray, t_before: float, t_after: float, pad: float
+) -> List[np.ndarray]:
+    """
+    Splits sorted events into clusters whose (padded) windows overlap.
+
+    Samples in a cluster's window can only be aligned to events of that cluster,
+    so clusters can be aligned independently of each other.
+    """
+    if len(events) == 0:
+        return []
+    starts = events - t_before - pad
+    stops = np.maximum.accumulate(events + t_after + pad)
+    breaks = np.flatnonzero(starts[1:] > stops[:-1]) + 1
+    return np.split(np.arange(len(events)), breaks)
+
+
+def _iter_window_batches(
+    pf: pq.ParquetFile,
+    time_col: str,
+    columns: Optional[List[str]],
+    bounds: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    batch_size: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the rows of a Parquet file falling in any of the sorted, disjoint windows [lo, hi].
+
+    Only row groups intersecting a window are read, in batches of at most `batch_size`
+    rows, so memory does not depend on the row-group size. Batches keep the row
+    positions of the file as their index.
+    """
+    n_rows = [pf.metadata.row_group(i).num_rows for i in range(pf.num_row_groups)]
+    row_offsets = np.concatenate([[0], np.cumsum(n_rows)])
+    # first window ending at or after the start of every row group
+    first = np.searchsorted(hi, bounds[:, 0], side="left")
+    needed = (first < len(lo)) & (lo[np.minimum(first, len(lo) - 1)] <= bounds[:, 1])
+    for i in np.flatnonzero(needed):
+        offset = row_offsets[i]
+        for batch in pf.iter_batches(
+            batch_size=batch_size, row_groups=[int(i)], columns=columns
+        ):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            time = df[time_col].to_numpy()
+            window = np.searchsorted(hi, time, side="left")
+            is_inside = (window < len(lo)) & (
+                lo[np.minimum(window, len(lo) - 1)] <= time
+            )
+            if is_inside.any():
+                yield df.loc[is_inside]
+
+
+def _iter_aligned_clusters(
+    path: str,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str,
+    columns: Optional[Sequence[str]],
+    created_event_index_col: str,
+    created_aligned_time_col: str,
+    round_precision: int,
+    batch_size: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields `align_to_events` output one cluster of overlapping event windows at a time.
+
+    The file is streamed once in batches of at most `batch_size` rows, keeping only rows
+    inside a cluster's window. Batches are kept while later clusters may still need
+    them, so windows crossing batch or row-group boundaries are assembled whole.
+    """
+    pf = pq.ParquetFile(path)
+    if columns is not None:
+        columns = [time_col] + [c for c in columns if c != time_col]
+    bounds = _row_group_bounds(pf, time_col)
+    # guards against float error at the window edges; align_to_events makes the final cut
+    pad = 1e-9 * max(1.0, float(np.abs(bounds).max(initial=0)))
+
+    clusters = _event_clusters(events, t_before, t_after, pad)
+    if not clusters:
+        return
+    lo = np.array([events[cluster[0]] for cluster in clusters]) - t_before - pad
+    hi = np.array([events[cluster[-1]] for cluster in clusters]) + t_after + pad
+    batches = _iter_window_batches(
+        pf, time_col, columns, bounds, lo, hi, batch_size=batch_size
+    )
+
+    loaded: List[pd.DataFrame] = []
+    is_exhausted = False
+    for cluster, cluster_lo, cluster_hi in zip(clusters, lo, hi):
+        while not is_exhausted and (
+            not loaded or loaded[-1][time_col].iloc[-1] <= cluster_hi
+        ):
+            batch = next(batches, None)
+            if batch is None:
+                is_exhausted = True
+            else:
+                loaded.append(batch)
+        # clusters are sorted, so batches ending before this one are not needed again
+        loaded = [df for df in loaded if df[time_col].iloc[-1] >= cluster_lo]
+        if not loaded:
+            continue
+
+        df_window = pd.concat(loaded)
+        df_window = df_window.loc[
+            (df_window[time_col] >= cluster_lo) & (df_window[time_col] <= cluster_hi)
+        ]
+        if len(df_window) == 0:
+            continue
+
+        df_aligned = align_to_events(
+            df_window.copy(),
+            events[cluster],
+            t_before=t_before,
+            t_after=t_after,
+            time_col=time_col,
+            created_event_index_col=created_event_index_col,
+            created_aligned_time_col=created_aligned_time_col,
+            round_precision=round_precision,
+            drop_non_aligned=True,
+        )
+        df_aligned[created_event_index_col] += cluster[0]
+        yield df_aligned
+
+
+def align_to_events_parquet(
+    path: str,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str = "time",
+    columns: Optional[Sequence[str]] = None,
+    created_event_index_col: str = "event_idx",
+    created_aligned_time_col: str = "aligned_time",
+    round_precision: int = 1,
+    batch_size: int = 65536,
+) -> pd.DataFrame:
+    """
+    Aligns a wide-format Parquet recording to events without loading the whole recording.
+
+    Events are grouped into clusters of overlapping windows. Only the row groups
+    intersecting a cluster are read, in batches of at most `batch_size` rows, and only
+    rows inside a window are kept, so memory is bounded even for files written as one
+    large row group. The output matches `align_to_events` with
+    drop_non_aligned=True on the full recording, including its row index.
+
+    Args:
+        path (str): Path to a Parquet file with a time column sorted in increasing order.
+        events (np.ndarray): A numpy array of event times. Events are sorted before aligning.
+        t_before (float): The time before the event to align to.
+        t_after (float): The time after the event to align to.
+        time_col (str): The name of the time column in the file.
+        columns (Optional[Sequence[str]]): Trace columns to read. Defaults to all columns.
+        created_event_index_col (str): The name of the new column with the index of the event that was aligned to.
+        created_aligned_time_col (str): The name of the new column with the aligned time.
+        round_precision (int): The number of decimal places to round the aligned time to.
+        batch_size (int): The maximum number of rows read from the file at once.
+
+    Returns:
+        pd.DataFrame: A wide dataframe with the aligned time and the index of the event that was aligned to.
+    """
+    events = np.sort(np.asarray(events, dtype=float))
+    df_list = list(
+        _iter_aligned_clusters(
+            path,
+            events,
+            t_before=t_before,
+            t_after=t_after,
+            time_col=time_col,
+            columns=columns,
+            created_event_index_col=created_event_index_col,
+            created_aligned_time_col=created_aligned_time_col,
+            round_precision=round_precision,
+            batch_size=batch_size,
+        )
+    )
+    if not df_list:
+        raise ValueError("No samples of the recording fall within the event windows.")
+    return pd.concat(df_list)
+
+
+def average_trace_parquet(
+    path: str,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str = "time",
+    columns: Optional[Sequence[str]] = None,
+    created_aligned_time_col: str = "aligned_time",
+    round_precision: int = 1,
+    agg_func: Union[str, Callable] = "mean",
+    batch_size: int = 65536,
+) -> pd.DataFrame:
+    """
+    Aligns a wide-format Parquet recording to events and averages it, reading only event windows.
+
+    With agg_func="mean", per-lag sums and counts are accumulated cluster by cluster so
+    only one cluster of windows is held in memory at a time. Other aggregations are
+    applied to the aligned windows, which are concatenated first.
+
+    Args:
+        path (str): Path to a Parquet file with a time column sorted in increasing order.
+        events (np.ndarray): A numpy array of event times.
+        t_before (float): time before event to align to
+        t_after (float): time after event to align to
+        time_col (str, optional): name of time column. Defaults to "time".
+        columns (Optional[Sequence[str]], optional): trace columns to read. Defaults to all columns.
+        created_aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
+        round_precision (int, optional): precision to round to. Defaults to 1.
+        agg_func (Union[str, Callable], optional): aggregation function to use. Defaults to "mean".
+        batch_size (int, optional): maximum number of rows read from the file at once. Defaults to 65536.
+
+    Returns:
+        pd.DataFrame: dataframe with average trace, matching `average_trace`.
+    """
+    _check_event_agg_func(agg_func)
+    events = np.sort(np.asarray(events, dtype=float))
+    clusters = _iter_aligned_clusters(
+        path,
+        events,
+        t_before=t_before,
+        t_after=t_after,
+        time_col=time_col,
+        columns=columns,
+        created_event_index_col="event_idx",
+        created_aligned_time_col=created_aligned_time_col,
+        round_precision=round_precision,
+        batch_size=batch_size,
+    )
+    if agg_func != "mean":
+        df_list = list(clusters)
+        if not df_list:
+            raise ValueError("No samples of the recording fall within the event windows.")
+        return _agg_over_events(
+            pd.concat(df_list),
+            created_aligned_time_col,
+            drop_cols=["event_idx", time_col],
+            agg_func=agg_func,
+        )
+
+    sums, counts = None, None
+    for df_aligned in clusters:
+        grouped = df_aligned.drop(["event_idx", time_col], axis=1).groupby(
+            created_aligned_time_col
+        )
+        if sums is None:
+            sums, counts = grouped.sum(), grouped.count()
+        else:
+            sums = sums.add(grouped.sum(), fill_value=0)
+            counts = counts.add(grouped.count(), fill_value=0)
+    if sums is None:
+        raise ValueError("No samples of the recording fall within the event windows.")
+    df_average_trace = sums / counts
+    return df_average_trace.reset_index()
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, List, Optional
+
+
+def _include_cols(df_wide: pd.DataFrame, exclude_cols: Optional[List[str]]) -> list:
+    """Columns of df_wide not in exclude_cols, in their original order."""
+    exclude_cols = set(exclude_cols or [])
+    return [c for c in df_wide.columns if c not in exclude_cols]
+
+
+def _transform_columns(
+    df_wide: pd.DataFrame,
+    cols: list,
+    float32: bool,
+    transform: Callable[[int, np.ndarray], None],
+) -> pd.DataFrame:
+    """
+    Replaces every column of cols by a float32 or float64 copy modified by transform(j, values).
+
+    Columns are copied, transformed in place and written back one at a time, so beyond
+    the output only one column is held at once, rather than a copy of all columns.
+    """
+    dtype = np.float32 if float32 else np.float64
+    for j, col in enumerate(cols):
+        values = df_wide[col].to_numpy(dtype=dtype, copy=True)
+        transform(j, values)
+        df_wide[col] = values
+    return df_wide
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import scipy.ndimage
+from typing import Optional, List
+from ._utils import _include_cols, _transform_columns
+
+
+def _block_centers(n_samples: int, factor: int) -> np.ndarray:
+    """Row at the center of every block of `factor` rows, the last block possibly shorter."""
+    centers = np.arange(0, n_samples, factor) + (factor - 1) // 2
+    return centers.clip(max=n_samples - 1)
+
+
+def _decimate(values: np.ndarray, factor: int) -> np.ndarray:
+    """
+    The rows at the centers of consecutive blocks of `factor` rows.
+
+    Rows are subsampled rather than averaged, so the noise distribution, and with it
+    the percentiles of the decimated traces, is unchanged.
+    """
+    return values[_block_centers(len(values), factor)]
+
+
+def _interpolate_blocks(blocks: np.ndarray, factor: int, n_samples: int) -> np.ndarray:
+    """Linearly interpolates block values, placed at block centers, back onto every row."""
+    centers = _block_centers(n_samples, factor)
+    position = np.interp(np.arange(n_samples), centers, np.arange(len(blocks)))
+    left = np.minimum(position.astype(int), len(blocks) - 1)
+    right = np.minimum(left + 1, len(blocks) - 1)
+    weight = (position - left)[:, None].astype(blocks.dtype)
+    return blocks[left] * (1 - weight) + blocks[right] * weight
+
+
+def running_percentile(
+    values: np.ndarray, size: int, percentile: float = 8
+) -> np.ndarray:
+    """
+    Running percentile of every column of a 2D array over a centered window of `size` rows.
+
+    Columns are filtered one at a time with `scipy.ndimage.percentile_filter`, whose 1D
+    sliding-window rank filter is far faster than filtering the 2D array at once.
+    Edges are handled by repeating the first and last rows.
+
+    Args:
+        values (np.ndarray): (n_samples, n_columns) array without NaN.
+        size (int): window length in rows.
+        percentile (float): percentile in [0, 100]. Defaults to 8.
+
+    Returns:
+        np.ndarray: the running percentile, with the shape and dtype of values.
+    """
+    columns = np.ascontiguousarray(values.T)
+    out = np.empty_like(columns)
+    for j in range(len(columns)):
+        scipy.ndimage.percentile_filter(
+            columns[j], percentile, size=size, mode="nearest", output=out[j]
+        )
+    return out.T
+
+
+def dff(
+    df_wide: pd.DataFrame,
+    window: float = 30,
+    percentile: float = 8,
+    time_col: str = "time",
+    exclude_cols: Optional[List[str]] = None,
+    decimate: int = 1,
+    float32: bool = False,
+    return_baseline: bool = False,
+):
+    """
+    Normalizes traces to dF/F against a running-percentile baseline: (F - F0) / F0.
+
+    The baseline F0 of every column is its running `percentile` over a centered window
+    of `window` seconds. With `decimate` > 1, traces are first subsampled to every
+    `decimate`-th sample, the running percentile is taken on the shorter traces, and the
+    baseline is linearly interpolated back onto every sample, dividing the cost of the
+    running percentile by about `decimate`. Subsampling keeps the noise distribution, so
+    the baseline is not biased as with block averaging, but each window holds `decimate`
+    times fewer samples: the baseline is noisier, and low percentiles of windows of only
+    a few dozen samples are biased, so keep window / (dt * decimate) in the hundreds.
+    NaN samples are filled from their neighbours for the baseline and stay NaN. Columns
+    are transformed and written back to df_wide one at a time, keeping their order.
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with traces. Modified and returned.
+        window (float, optional): baseline window length in units of time_col. Defaults to 30.
+        percentile (float, optional): baseline percentile. Defaults to 8.
+        time_col (str, optional): name of time column, left unchanged. Defaults to "time".
+        exclude_cols (Optional[List[str]], optional): other columns left unchanged. Defaults to None.
+        decimate (int, optional): decimation factor of the baseline computation. Defaults to 1.
+        float32 (bool, optional): compute in float32 and write float32 columns. Defaults to False.
+        return_baseline (bool, optional): also return the baseline F0 as a dataframe. Defaults to False.
+
+    Returns:
+        The dF/F dataframe, and if return_baseline, the baseline with the same columns.
+    """
+    if decimate < 1:
+        raise ValueError(f"decimate must be a positive integer, not {decimate}")
+    cols = _include_cols(df_wide, [time_col] + list(exclude_cols or []))
+    time = df_wide[time_col].to_numpy(dtype=float)
+    if len(time) < 2:
+        raise ValueError("At least two samples are needed to infer the sample period.")
+    dt = float(np.median(np.diff(time)))
+    if decimate > 1:
+        size = max(int(round(window / (dt * decimate))), 1)
+    else:
+        size = max(int(round(window / dt)), 1)
+    baselines = None
+    if return_baseline:
+        baselines = np.empty(
+            (len(df_wide), len(cols)), dtype=np.float32 if float32 else np.float64
+        )
+
+    def transform(j: int, values: np.ndarray):
+        filled = values
+        if np.isnan(values).any():
+            filled = pd.Series(values).ffill().bfill().to_numpy(dtype=values.dtype)
+        filled = filled[:, None]
+        if decimate > 1:
+            baseline = _interpolate_blocks(
+                running_percentile(_decimate(filled, decimate), size, percentile),
+                decimate,
+                len(values),
+            )[:, 0]
+        else:
+            baseline = running_percentile(filled, size, percentile)[:, 0]
+        if baselines is not None:
+            baselines[:, j] = baseline
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values -= baseline
+            values /= baseline
+
+    df_wide = _transform_columns(df_wide, cols, float32, transform)
+
+    if return_baseline:
+        return df_wide, pd.DataFrame(baselines, columns=cols, index=df_wide.index)
+    return df_wide
@@ -1,32 +1,89 @@
+import warnings
+import numpy as np
 import pandas as pd
 from typing import Optional, List
+from ._utils import _include_cols, _transform_columns
 
 
-def _min_max_drop(df_wide: pd.DataFrame) -> pd.DataFrame:
-    return df_wide.apply(
-        lambda x: (x - x.dropna().min()) / (x.dropna().max() - x.dropna().min()), axis=0
-    )
+def _min_max_params(values: np.ndarray) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.stack(
+            [
+                np.nanmin(values, axis=0).astype(np.float64),
+                np.nanmax(values, axis=0).astype(np.float64),
+            ]
+        )
 
 
-def _min_max_keep(df_wide: pd.DataFrame) -> pd.DataFrame:
-    return df_wide.apply(lambda x: (x - x.min()) / (x.max() - x.min()), axis=0)
+def _min_max_transform(values: np.ndarray, col_min: np.ndarray, col_max: np.ndarray):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values -= col_min.astype(values.dtype)
+        values /= (col_max - col_min).astype(values.dtype)
 
 
 def min_max(
     df_wide: pd.DataFrame,
     exclude_cols: Optional[List[str]] = None,
     drop_na: bool = True,
+    float32: bool = False,
+    return_params: bool = False,
 ):
-    if exclude_cols is None:
-        exclude_cols = []
+    """
+    Scales every column of a wide dataframe, except exclude_cols, to [0, 1].
+
+    Minima and maxima ignore NaN, whatever drop_na, as `Series.min` and `Series.max` do.
+    Columns are transformed and written back to df_wide one at a time, keeping their order.
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with traces. Modified and returned.
+        exclude_cols (Optional[List[str]], optional): columns left unchanged, e.g. time. Defaults to None.
+        drop_na (bool, optional): kept for compatibility; NaN is always ignored. Defaults to True.
+        float32 (bool, optional): compute in float32 and write float32 columns, halving the
+            memory of the output. Defaults to False.
+        return_params (bool, optional): also return the fitted parameters, for `apply_min_max`. Defaults to False.
 
-    include_cols = set(df_wide.columns) - set(exclude_cols)
+    Returns:
+        The scaled dataframe, and if return_params, a dataframe of the "min" and "max" of every column.
+    """
+    cols = _include_cols(df_wide, exclude_cols)
+    params = np.empty((2, len(cols)))
 
-    if drop_na:
-        method = _min_max_drop
-    else:
-        method = _min_max_keep
+    def transform(j: int, values: np.ndarray):
+        params[:, j] = _min_max_params(values)
+        _min_max_transform(values, params[0, j], params[1, j])
 
-    df_wide.loc[:, include_cols] = method(df_wide.loc[:, include_cols])
+    df_wide = _transform_columns(df_wide, cols, float32, transform)
+    col_min, col_max = params
 
+    if return_params:
+        params = pd.DataFrame([col_min, col_max], index=["min", "max"], columns=cols)
+        return df_wide, params
     return df_wide
+
+
+def apply_min_max(
+    df_wide: pd.DataFrame,
+    params: pd.DataFrame,
+    float32: bool = False,
+) -> pd.DataFrame:
+    """
+    Scales the columns of df_wide with parameters fitted by `min_max`, e.g. on another session.
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with the columns of params. Modified and returned.
+        params (pd.DataFrame): "min" and "max" rows returned by `min_max(..., return_params=True)`.
+        float32 (bool, optional): compute in float32 and write float32 columns. Defaults to False.
+
+    Returns:
+        pd.DataFrame: the scaled dataframe.
+    """
+    cols = list(params.columns)
+    col_min = params.loc["min"].to_numpy(float)
+    col_max = params.loc["max"].to_numpy(float)
+    return _transform_columns(
+        df_wide,
+        cols,
+        float32,
+        lambda j, values: _min_max_transform(values, col_min[j], col_max[j]),
+    )
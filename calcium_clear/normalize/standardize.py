@@ -1,33 +1,91 @@
+import warnings
+import numpy as np
 import pandas as pd
-import scipy.stats
 from typing import Optional, List
+from ._utils import _include_cols, _transform_columns
 
 
-def _zscore_drop(
-    df_wide: pd.DataFrame,
-) -> pd.DataFrame:
-    return df_wide.apply(lambda x: (x - x.dropna().mean()) / x.dropna().std(), axis=0)
+def _zscore_params(values: np.ndarray, drop_na: bool) -> pd.DataFrame:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        if drop_na:
+            mean = np.nanmean(values, axis=0, dtype=np.float64)
+            std = np.nanstd(values, axis=0, ddof=1, dtype=np.float64)
+        else:
+            # as scipy.stats.zscore: ddof=0, NaN propagates
+            mean = values.mean(axis=0, dtype=np.float64)
+            std = values.std(axis=0, dtype=np.float64)
+    return np.stack([mean, std])
 
 
-def _zscore_keep(df_wide: pd.DataFrame) -> pd.DataFrame:
-    return df_wide.apply(scipy.stats.zscore, axis=0)
+def _zscore_transform(values: np.ndarray, mean: np.ndarray, std: np.ndarray):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values -= mean.astype(values.dtype)
+        values /= std.astype(values.dtype)
 
 
 def zscore(
     df_wide: pd.DataFrame,
     exclude_cols: Optional[List[str]] = None,
     drop_na: bool = True,
+    float32: bool = False,
+    return_params: bool = False,
 ):
-    if exclude_cols is None:
-        exclude_cols = []
+    """
+    Z-scores every column of a wide dataframe, except exclude_cols.
+
+    Columns are transformed and written back to df_wide one at a time, keeping their order.
 
-    include_cols = set(df_wide.columns) - set(exclude_cols)
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with traces. Modified and returned.
+        exclude_cols (Optional[List[str]], optional): columns left unchanged, e.g. time. Defaults to None.
+        drop_na (bool, optional): ignore NaN and use the sample std (ddof=1). Otherwise, as
+            scipy.stats.zscore, use ddof=0 and let NaN propagate. Defaults to True.
+        float32 (bool, optional): compute in float32 and write float32 columns, halving the
+            memory of the output. Defaults to False.
+        return_params (bool, optional): also return the fitted parameters, for `apply_zscore`. Defaults to False.
 
-    if drop_na:
-        method = _zscore_drop
-    else:
-        method = _zscore_keep
+    Returns:
+        The z-scored dataframe, and if return_params, a dataframe of the "mean" and "std" of every column.
+    """
+    cols = _include_cols(df_wide, exclude_cols)
+    params = np.empty((2, len(cols)))
 
-    df_wide.loc[:, include_cols] = method(df_wide.loc[:, include_cols])
+    def transform(j: int, values: np.ndarray):
+        params[:, j] = _zscore_params(values, drop_na)
+        _zscore_transform(values, params[0, j], params[1, j])
 
+    df_wide = _transform_columns(df_wide, cols, float32, transform)
+    mean, std = params
+
+    if return_params:
+        params = pd.DataFrame([mean, std], index=["mean", "std"], columns=cols)
+        return df_wide, params
     return df_wide
+
+
+def apply_zscore(
+    df_wide: pd.DataFrame,
+    params: pd.DataFrame,
+    float32: bool = False,
+) -> pd.DataFrame:
+    """
+    Z-scores the columns of df_wide with parameters fitted by `zscore`, e.g. on another session.
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with the columns of params. Modified and returned.
+        params (pd.DataFrame): "mean" and "std" rows returned by `zscore(..., return_params=True)`.
+        float32 (bool, optional): compute in float32 and write float32 columns. Defaults to False.
+
+    Returns:
+        pd.DataFrame: the z-scored dataframe.
+    """
+    cols = list(params.columns)
+    mean = params.loc["mean"].to_numpy(float)
+    std = params.loc["std"].to_numpy(float)
+    return _transform_columns(
+        df_wide,
+        cols,
+        float32,
+        lambda j, values: _zscore_transform(values, mean[j], std[j]),
+    )
@@ -0,0 +1,276 @@
+from typing import Optional, Sequence, Tuple, Union
+import warnings
+import pandas as pd
+import numpy as np
+from joblib import Parallel, delayed
+from calcium_clear.align.epochs import (
+    _event_sample_idx,
+    _sample_period,
+    _sorted_time,
+    lag_offsets,
+)
+from calcium_clear.stats import p_adjust
+from calcium_clear.surrogates.cache import NullCache, null_cache_key
+
+PERMUTATION_STATISTICS = ("mean_diff", "post_mean")
+# memory budget of the float64 temporaries of one batch of shuffles
+_BATCH_BYTES = 64 << 20
+# float64 temporaries of shape (..., n_events, n_neurons) alive at once in _window_statistic
+_N_TEMPORARIES = 4
+
+
+def _circular_prefix_sums(
+    values: np.ndarray, n_before: int, n_after: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prefix sums of values and of their non-NaN count over the recording wrapped around its ends.
+
+    Row i + n_before of the padded recording is sample i, so any window of at most
+    n_before samples before and n_after samples after an event sample is one contiguous slice.
+    """
+    n_samples = len(values)
+    padded = values[np.arange(-n_before, n_samples + n_after + 1) % n_samples]
+    is_valid = ~np.isnan(padded)
+    zeros = np.zeros((1, values.shape[1]))
+    csum = np.concatenate([zeros, np.cumsum(np.where(is_valid, padded, 0), axis=0)])
+    ccount = np.concatenate(
+        [zeros.astype(np.int32), np.cumsum(is_valid, axis=0, dtype=np.int32)]
+    )
+    return csum, ccount
+
+
+def _window_statistic(
+    csum: np.ndarray,
+    ccount: np.ndarray,
+    event_idx: np.ndarray,
+    n_before: int,
+    n_after: int,
+    statistic: str,
+) -> np.ndarray:
+    """
+    Response statistic of every neuron for event sample indices of shape (..., n_events).
+
+    Returns a float64 array of shape (..., n_neurons): the mean over events of the
+    post-window mean, minus the pre-window mean for "mean_diff". Windows are taken on
+    the recording wrapped around its ends, so the window of an event near the start or
+    end continues from the other end, exactly as the data of a circular shift would.
+    Events are processed in chunks keeping the float64 temporaries within
+    `_BATCH_BYTES`, and the sum over events is accumulated in float64 like `csum`.
+    """
+    batch_shape, n_events = event_idx.shape[:-1], event_idx.shape[-1]
+    n_neurons = csum.shape[1]
+    event_bytes = _N_TEMPORARIES * 8 * n_neurons * int(np.prod(batch_shape))
+    chunk_size = max(1, _BATCH_BYTES // max(event_bytes, 1))
+
+    total = np.zeros(batch_shape + (n_neurons,))
+    n_valid = np.zeros(batch_shape + (n_neurons,), dtype=np.int32)
+    for chunk_start in range(0, n_events, chunk_size):
+        # pre is [event - n_before, event), post is [event, event + n_after]
+        start = event_idx[..., chunk_start : chunk_start + chunk_size]
+        event = start + n_before
+        stop = start + n_before + n_after + 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            post = (csum[stop] - csum[event]) / (ccount[stop] - ccount[event])
+            if statistic == "mean_diff":
+                post -= (csum[event] - csum[start]) / (ccount[event] - ccount[start])
+        is_valid = ~np.isnan(post)
+        total += np.where(is_valid, post, 0).sum(axis=-2)
+        n_valid += is_valid.sum(axis=-2, dtype=np.int32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / n_valid
+
+
+def _null_batch(
+    csum: np.ndarray,
+    ccount: np.ndarray,
+    event_idx: np.ndarray,
+    shifts: np.ndarray,
+    n_samples: int,
+    n_before: int,
+    n_after: int,
+    statistic: str,
+) -> np.ndarray:
+    # rotating traces forward by k samples is the same as moving events back by k
+    shifted = (event_idx[None, :] - shifts[:, None]) % n_samples
+    return _window_statistic(csum, ccount, shifted, n_before, n_after, statistic)
+
+
+def permutation_test(
+    df_wide: pd.DataFrame,
+    events: np.ndarray,
+    t_before: float,
+    t_after: float,
+    time_col: str = "time",
+    neuron_cols: Optional[Sequence[str]] = None,
+    statistic: str = "mean_diff",
+    n_shuffles: int = 1000,
+    alternative: str = "two-sided",
+    batch_size: Optional[int] = None,
+    n_jobs: int = 1,
+    random_state: Optional[Union[int, np.random.Generator]] = None,
+    cache: Optional[NullCache] = None,
+    p_adjust_method: Optional[str] = "Benjamini-Hochberg",
+    alpha: float = 0.05,
+    created_neuron_col: str = "neuron",
+    activated_label: str = "activated",
+    inhibited_label: str = "inhibited",
+    non_responsive_label: str = "non-responsive",
+) -> pd.DataFrame:
+    """
+    Classifies responders against a null distribution of circularly shifted traces.
+
+    Circularly shifting the traces by k samples is equivalent to shifting the event
+    samples by -k modulo the recording length, so no rotated recording is ever built:
+    window sums come from prefix sums of the (wrapped) recording, and every shuffle costs
+    O(n_events x n_neurons). Shuffles are evaluated in vectorized batches, optionally
+    spread across processes. Windows wrap around the recording ends: the pre window of
+    an event less than t_before after the start takes its first samples from the end of
+    the recording, and a post window running past the end continues from the start.
+    The observed statistic uses the same wrapped windows as the shuffles, so both
+    are computed identically.
+
+    Args:
+        df_wide (pd.DataFrame): wide dataframe with traces
+        events (np.ndarray): array of events
+        t_before (float): length of the pre window
+        t_after (float): length of the post window
+        time_col (str, optional): name of time column. Defaults to "time".
+        neuron_cols (Optional[Sequence[str]], optional): columns to test. Defaults to all columns except time_col.
+        statistic (str, optional): "mean_diff" (post mean - pre mean) or "post_mean", averaged over events.
+            Defaults to "mean_diff".
+        n_shuffles (int, optional): number of circular shifts in the null distribution. Defaults to 1000.
+        alternative (str, optional): "two-sided", "greater" or "less". Defaults to "two-sided".
+        batch_size (Optional[int], optional): number of shuffles evaluated at once. Defaults to None,
+            sizing batches so their temporaries take about 64 MiB.
+        n_jobs (int, optional): number of processes evaluating batches. Defaults to 1.
+        random_state (Optional[Union[int, np.random.Generator]], optional): seed or generator of the shifts. Defaults to None.
+        cache (Optional[NullCache], optional): on-disk cache of null distributions, keyed by the traces,
+            events, statistic, windows, number of shuffles and seed. Only used when `random_state` is an int,
+            since the null is otherwise not reproducible. Defaults to None.
+        p_adjust_method (Optional[str], optional): method of `calcium_clear.stats.p_adjust`, or None
+            for no correction. Defaults to "Benjamini-Hochberg".
+        alpha (float, optional): significance level of adjusted p values. Defaults to 0.05.
+        created_neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+        activated_label (str, optional): label of neurons with a significantly high statistic. Defaults to "activated".
+        inhibited_label (str, optional): label of neurons with a significantly low statistic. Defaults to "inhibited".
+        non_responsive_label (str, optional): label of other neurons. Defaults to "non-responsive".
+
+    Returns:
+        pd.DataFrame: one row per neuron with the observed statistic, mean and std of the null
+        distribution, p value, adjusted p value and response label.
+    """
+    if statistic not in PERMUTATION_STATISTICS:
+        raise ValueError(
+            f"statistic must be one of {list(PERMUTATION_STATISTICS)}, not {statistic}"
+        )
+    if alternative not in ("two-sided", "greater", "less"):
+        raise ValueError(
+            f"alternative must be one of ['two-sided', 'greater', 'less'], not {alternative}"
+        )
+    time = _sorted_time(df_wide, time_col)
+    dt = _sample_period(time)
+    if neuron_cols is None:
+        neuron_cols = [c for c in df_wide.columns if c != time_col]
+    neuron_cols = list(neuron_cols)
+    values = df_wide[neuron_cols].to_numpy(dtype=float)
+    n_samples = len(values)
+
+    event_idx = _event_sample_idx(time, np.asarray(events, dtype=float), dt)
+    event_idx = event_idx[(event_idx >= 0) & (event_idx < n_samples)]
+    if len(event_idx) == 0:
+        raise ValueError("No events fall inside the recording.")
+    offsets = lag_offsets(t_before, t_after, dt)
+    n_before, n_after = -offsets[0], offsets[-1]
+    csum, ccount = _circular_prefix_sums(values, n_before, n_after)
+
+    observed = _window_statistic(
+        csum, ccount, event_idx, n_before, n_after, statistic
+    )
+
+    def compute_null() -> np.ndarray:
+        rng = np.random.default_rng(random_state)
+        shifts = rng.integers(1, n_samples, size=n_shuffles)
+        if batch_size is None:
+            shuffle_bytes = _N_TEMPORARIES * 8 * len(event_idx) * len(neuron_cols)
+            size = max(1, min(n_shuffles, _BATCH_BYTES // max(shuffle_bytes, 1)))
+        else:
+            size = batch_size
+        batches = [
+            shifts[start : start + size] for start in range(0, n_shuffles, size)
+        ]
+        batch_kwargs = dict(
+            csum=csum,
+            ccount=ccount,
+            event_idx=event_idx,
+            n_samples=n_samples,
+            n_before=n_before,
+            n_after=n_after,
+            statistic=statistic,
+        )
+        if n_jobs == 1:
+            null = [_null_batch(shifts=batch, **batch_kwargs) for batch in batches]
+        else:
+            null = Parallel(n_jobs=n_jobs)(
+                delayed(_null_batch)(shifts=batch, **batch_kwargs) for batch in batches
+            )
+        return np.concatenate(null)
+
+    if cache is not None and isinstance(random_state, (int, np.integer)):
+        key = null_cache_key(
+            values,
+            event_idx,
+            test="permutation_test",
+            statistic=statistic,
+            n_before=int(n_before),
+            n_after=int(n_after),
+            n_shuffles=n_shuffles,
+            random_state=int(random_state),
+        )
+        null = np.asarray(cache.get_or_compute(key, compute_null))
+    else:
+        null = compute_null()
+
+    pvalues = _permutation_pvalues(observed, null, alternative)
+    if p_adjust_method is None:
+        p_adj = pvalues
+    else:
+        p_adj = p_adjust(pvalues, method=p_adjust_method)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        null_mean = np.nanmean(null, axis=0)
+        null_std = np.nanstd(null, axis=0)
+    is_significant = p_adj < alpha
+    response = np.select(
+        [is_significant & (observed > null_mean), is_significant & (observed < null_mean)],
+        [activated_label, inhibited_label],
+        default=non_responsive_label,
+    )
+    return pd.DataFrame(
+        {
+            created_neuron_col: neuron_cols,
+            "statistic": observed,
+            "null_mean": null_mean,
+            "null_std": null_std,
+            "p": pvalues,
+            "p_adj": p_adj,
+            "response": response,
+        }
+    )
+
+
+def _permutation_pvalues(
+    observed: np.ndarray, null: np.ndarray, alternative: str
+) -> np.ndarray:
+    """Permutation p values with the observed statistic counted as one of the shuffles."""
+    is_valid = ~np.isnan(null)
+    if alternative == "greater":
+        n_extreme = (null >= observed).sum(axis=0)
+    elif alternative == "less":
+        n_extreme = (null <= observed).sum(axis=0)
+    else:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            center = np.nanmean(null, axis=0)
+        n_extreme = (np.abs(null - center) >= np.abs(observed - center)).sum(axis=0)
+    pvalues = (n_extreme + 1) / (is_valid.sum(axis=0) + 1)
+    return np.where(np.isnan(observed), np.nan, pvalues)
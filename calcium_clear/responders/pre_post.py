@@ -1,7 +1,132 @@
-from typing import Optional, Union, Callable
+from typing import Optional, Tuple, Union, Callable
+import warnings
 import pandas as pd
 import numpy as np
-from calcium_clear.stats import auc
+import scipy.stats
+from calcium_clear.stats import p_adjust
+from calcium_clear.stats.reducers import is_reducer
+from calcium_clear.stats.segments import reduce_segments, segment_codes
+
+PAIRED_TESTS = ("wilcoxon", "ttest", "sign")
+
+
+def _prepost_matrices(
+    df_aligned: pd.DataFrame,
+    aligned_time_col: str,
+    zero_time: float,
+    time_col: Optional[str],
+    event_idx_col: str,
+    compare_func: Union[str, Callable],
+) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    """Reduces the pre and post window of every event for all neurons at once."""
+    drop_cols = [aligned_time_col, event_idx_col]
+    if time_col is not None:
+        drop_cols.append(time_col)
+    neurons = df_aligned.columns.drop(drop_cols)
+    is_post = df_aligned[aligned_time_col].to_numpy() >= zero_time
+    df = df_aligned.assign(_is_post=is_post)
+    keys = [event_idx_col, "_is_post"]
+
+    if is_reducer(compare_func):
+        order, starts, index = segment_codes(df, keys)
+        values = df[neurons].to_numpy(dtype=float)[order]
+        x = df[aligned_time_col].to_numpy(dtype=float)[order]
+        reduced = reduce_segments(compare_func, values, starts, x=x)
+        df_reduced = pd.DataFrame(reduced, index=index, columns=neurons)
+    else:
+        df_reduced = df.groupby(keys)[list(neurons)].agg(compare_func)
+
+    df_reduced = df_reduced.unstack("_is_post")
+    pre = df_reduced.xs(False, axis=1, level="_is_post")[neurons].to_numpy(dtype=float)
+    post = df_reduced.xs(True, axis=1, level="_is_post")[neurons].to_numpy(dtype=float)
+    return pre, post, neurons
+
+
+def _sign_test(diff: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Two-sided exact sign test along the first axis, ignoring NaN and zero differences."""
+    n_pos = (diff > 0).sum(axis=0)
+    n_neg = (diff < 0).sum(axis=0)
+    n = n_pos + n_neg
+    pvalues = np.minimum(
+        2 * scipy.stats.binom.cdf(np.minimum(n_pos, n_neg), n, 0.5), 1
+    )
+    return n_pos - n_neg, np.where(n > 0, pvalues, np.nan)
+
+
+def paired_test(
+    pre: np.ndarray, post: np.ndarray, test: str = "wilcoxon"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Paired test between post and pre along the first axis, for every column at once.
+
+    Args:
+        pre (np.ndarray): (n_events, n_neurons) pre values.
+        post (np.ndarray): (n_events, n_neurons) post values.
+        test (str): one of "wilcoxon" (signed-rank), "ttest" (paired t-test) or "sign". Defaults to "wilcoxon".
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: test statistic and two-sided p value of every column.
+        Events with a NaN pre or post value are omitted.
+    """
+    if test not in PAIRED_TESTS:
+        raise ValueError(f"test must be one of {list(PAIRED_TESTS)}, not {test}")
+    diff = post - pre
+    if test == "sign":
+        return _sign_test(diff)
+
+    if test == "ttest":
+        return _paired_ttest(diff)
+    return _wilcoxon(diff)
+
+
+def _paired_ttest(diff: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Paired t-test of diff against zero along the first axis, ignoring NaN, as `scipy.stats.ttest_rel`."""
+    n = (~np.isnan(diff)).sum(axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nanmean(diff, axis=0)
+            std = np.nanstd(diff, axis=0, ddof=1)
+            statistic = mean / (std / np.sqrt(n))
+    statistic = np.where(n > 1, statistic, np.nan)
+    pvalues = 2 * scipy.stats.t.sf(np.abs(statistic), np.maximum(n - 1, 1))
+    return statistic, np.where(np.isnan(statistic), np.nan, pvalues)
+
+
+def _wilcoxon(diff: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilcoxon signed-rank test of diff along the first axis, ignoring NaN.
+
+    Events missing for every column, e.g. edge events without pre samples, are dropped
+    first. Columns without NaN are then tested in vectorized calls; only columns with
+    NaN go through scipy's per-column `nan_policy="omit"` path. Since scipy picks the
+    exact or asymptotic method for a whole call, complete columns with zeros or tied
+    differences are tested apart from the others, so every column gets the p value of
+    testing it on its own.
+    """
+    diff = diff[~np.isnan(diff).all(axis=1)]
+    has_nan = np.isnan(diff).any(axis=0)
+    abs_sorted = np.sort(np.abs(diff), axis=0)
+    has_ties = (abs_sorted[:1] == 0).any(axis=0) | (
+        np.diff(abs_sorted, axis=0) == 0
+    ).any(axis=0)
+    statistic = np.full(diff.shape[1], np.nan)
+    pvalues = np.full(diff.shape[1], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        warnings.simplefilter("ignore", category=UserWarning)
+        for columns, nan_policy in (
+            (~has_nan & ~has_ties, "propagate"),
+            (~has_nan & has_ties, "propagate"),
+            (has_nan, "omit"),
+        ):
+            if columns.any() and len(diff):
+                result = scipy.stats.wilcoxon(
+                    diff[:, columns], axis=0, nan_policy=nan_policy
+                )
+                statistic[columns] = result.statistic
+                pvalues[columns] = result.pvalue
+    return statistic, pvalues
 
 
 def pre_post(
@@ -10,20 +135,77 @@ def pre_post(
     zero_time: float = 0,
     time_col: Optional[str] = "time",
     compare_func: Union[str, Callable] = "auc",
+    event_idx_col: str = "event_idx",
+    test: str = "wilcoxon",
+    p_adjust_method: Optional[str] = "Benjamini-Hochberg",
+    alpha: float = 0.05,
+    created_neuron_col: str = "neuron",
+    activated_label: str = "activated",
+    inhibited_label: str = "inhibited",
+    non_responsive_label: str = "non-responsive",
 ) -> pd.DataFrame:
-    df_auc = (
-        df_aligned.assign(
-            pre_post=np.where(df_aligned["aligned_time"] < 0, "pre", "post")
-        )
-        .drop(["aligned_time", "time"], axis=1)
-        .groupby(["pre_post", "event_idx"])
-        .agg(auc)
-        .unstack()
-        .transpose()
-        .reset_index()
-        .rename(
-            columns={
-                "level_0": "cell_id",
-            }
-        )
+    """
+    Classifies neurons as activated, inhibited or non-responsive from pre vs post event activity.
+
+    The pre (aligned time < zero_time) and post window of every event is reduced for all
+    neurons at once, then every neuron is tested with a paired test across events in one
+    vectorized call, and p values are corrected for the number of neurons.
+
+    Args:
+        df_aligned (pd.DataFrame): wide aligned dataframe from `align_to_events`.
+        aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
+        zero_time (float, optional): aligned time separating pre from post. Defaults to 0.
+        time_col (Optional[str], optional): name of time column, None if absent. Defaults to "time".
+        compare_func (Union[str, Callable], optional): reducer applied to each window. Built-in or
+            registered reducer names are vectorized; other aggregations go through groupby. Defaults to "auc".
+        event_idx_col (str, optional): name of event index column. Defaults to "event_idx".
+        test (str, optional): paired test, one of "wilcoxon", "ttest" or "sign". Defaults to "wilcoxon".
+        p_adjust_method (Optional[str], optional): method of `calcium_clear.stats.p_adjust`, or None
+            for no correction. Defaults to "Benjamini-Hochberg".
+        alpha (float, optional): significance level of adjusted p values. Defaults to 0.05.
+        created_neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+        activated_label (str, optional): label of neurons with significantly higher post. Defaults to "activated".
+        inhibited_label (str, optional): label of neurons with significantly lower post. Defaults to "inhibited".
+        non_responsive_label (str, optional): label of other neurons. Defaults to "non-responsive".
+
+    Returns:
+        pd.DataFrame: one row per neuron with the mean pre and post values across events, the
+        median post - pre difference, the test statistic, p value, adjusted p value and response label.
+    """
+    pre, post, neurons = _prepost_matrices(
+        df_aligned,
+        aligned_time_col=aligned_time_col,
+        zero_time=zero_time,
+        time_col=time_col,
+        event_idx_col=event_idx_col,
+        compare_func=compare_func,
+    )
+    statistic, pvalues = paired_test(pre, post, test=test)
+    if p_adjust_method is None:
+        p_adj = pvalues
+    else:
+        p_adj = p_adjust(pvalues, method=p_adjust_method)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        diff = np.nanmedian(post - pre, axis=0)
+        pre_mean = np.nanmean(pre, axis=0)
+        post_mean = np.nanmean(post, axis=0)
+    is_significant = p_adj < alpha
+    response = np.select(
+        [is_significant & (diff > 0), is_significant & (diff < 0)],
+        [activated_label, inhibited_label],
+        default=non_responsive_label,
+    )
+    return pd.DataFrame(
+        {
+            created_neuron_col: np.asarray(neurons),
+            "pre": pre_mean,
+            "post": post_mean,
+            "diff": diff,
+            "statistic": statistic,
+            "p": pvalues,
+            "p_adj": p_adj,
+            "response": response,
+        }
     )
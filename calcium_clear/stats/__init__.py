@@ -1,2 +1,3 @@
 from .auc import auc
 from .p_adjust import p_adjust
+from .reducers import register_reducer, get_reducer, list_reducers, apply_reducer
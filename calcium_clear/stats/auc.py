@@ -1,13 +1,73 @@
+from typing import Optional
 import numpy as np
-import sklearn.metrics
 
 
-def auc(arr, to_1=True):
-    if to_1:
-        x = np.linspace(0, 1, len(arr))
+def _compact_valid(values: np.ndarray, x: np.ndarray):
+    """Moves non-NaN samples to the front of the last axis, keeping their order."""
+    x = np.broadcast_to(x, values.shape)
+    is_valid = ~np.isnan(values)
+    order = np.argsort(~is_valid, axis=-1, kind="stable")
+    return (
+        np.take_along_axis(values, order, axis=-1),
+        np.take_along_axis(x, order, axis=-1),
+        is_valid.sum(axis=-1),
+    )
+
+
+def auc(
+    arr,
+    to_1: bool = True,
+    x: Optional[np.ndarray] = None,
+    axis: int = -1,
+    skipna: bool = False,
+):
+    """
+    Trapezoid area under `arr` along `axis`, computed for every other index at once.
+
+    Args:
+        arr: array of values. A 1D array gives a scalar.
+        to_1 (bool): when `x` is None, integrate over an x-axis spanning [0, 1] rather than
+            one unit per sample. Defaults to True.
+        x (Optional[np.ndarray]): sample positions along `axis`, either 1D or broadcastable
+            against `arr`. Overrides `to_1`. Defaults to evenly spaced samples.
+        axis (int): axis to integrate along. Defaults to -1.
+        skipna (bool): integrate over the non-NaN samples only, as if they were dropped
+            before the call. Otherwise NaN propagates. Defaults to False.
+
+    Returns:
+        The area, NaN where fewer than two samples are available.
+    """
+    arr = np.moveaxis(np.asarray(arr, dtype=float), axis, -1)
+    n = arr.shape[-1]
+    if x is not None:
+        x = np.asarray(x, dtype=float)
+        if x.ndim > 1:
+            x = np.moveaxis(x, axis, -1)
+
+    if x is None and not skipna:
+        # unit spacing: sum of values minus half of both endpoints
+        if n < 2:
+            area = np.full(arr.shape[:-1], np.nan)
+        else:
+            area = arr.sum(axis=-1) - (arr[..., 0] + arr[..., -1]) / 2
+            if to_1:
+                area = area / (n - 1)
     else:
-        x = np.arange(len(arr))
-    try:
-        return sklearn.metrics.auc(x, arr)
-    except ValueError:
-        return np.nan
+        uniform = x is None
+        if uniform:
+            x = np.arange(n, dtype=float)
+        if skipna:
+            arr, x, n_valid = _compact_valid(arr, x)
+            if uniform:
+                # dropped samples leave no gap
+                x = np.arange(n, dtype=float)
+        else:
+            n_valid = np.full(arr.shape[:-1], n)
+        areas = (arr[..., 1:] + arr[..., :-1]) / 2 * np.diff(x, axis=-1)
+        is_pair = np.arange(1, n) < n_valid[..., None]
+        area = np.where(is_pair, areas, 0).sum(axis=-1)
+        if uniform and to_1:
+            area = area / np.maximum(n_valid - 1, 1)
+        area = np.where(n_valid > 1, area, np.nan)
+
+    return area[()] if np.ndim(area) == 0 else area
@@ -1,44 +1,63 @@
 import numpy as np
 
+P_ADJUST_METHODS = (
+    "Bonferroni",
+    "Bonferroni-Holm",
+    "Holm",
+    "Hochberg",
+    "Benjamini-Hochberg",
+    "Benjamini-Yekutieli",
+)
 
-def p_adjust(pvalues: np.ndarray, method: str = "Benjamini-Hochberg"):
+
+def p_adjust(
+    pvalues: np.ndarray, method: str = "Benjamini-Hochberg", axis: int = -1
+) -> np.ndarray:
     """
     Adjust p values for multiple comparisons using various methods
     Args:
-        pvalues: A numpy array of pvalues from various comparisons
+        pvalues: A numpy array of pvalues from various comparisons. Every 1D slice
+                along `axis` is adjusted as an independent family of tests.
         method: The p value correction method. Set of availible methods
-                comprise {'Bonferroni', 'Bonferroni-Holm', 'Benjamini-Hochberg'}
+                comprise {'Bonferroni', 'Bonferroni-Holm' (or 'Holm'), 'Hochberg',
+                'Benjamini-Hochberg', 'Benjamini-Yekutieli'}
+        axis: The axis holding the tests of a family. Defaults to -1.
     Returns:
-        A numpy array of adjusted pvalues
+        A numpy array of adjusted pvalues, capped at 1. NaN p values stay NaN and
+        are not counted as tests.
     """
-
-    n = pvalues.shape[0]
-    new_pvalues = np.empty(n)
+    if method not in P_ADJUST_METHODS:
+        raise ValueError(f"method must be one of {list(P_ADJUST_METHODS)}, not {method}")
+    pvalues = np.moveaxis(np.asarray(pvalues, dtype=float), axis, -1)
+    is_nan = np.isnan(pvalues)
+    n = (~is_nan).sum(axis=-1, keepdims=True)
 
     if method == "Bonferroni":
-        new_pvalues = n * pvalues
+        adjusted = n * pvalues
+    else:
+        # NaN sorts last, so the valid p values of every family come first
+        order = np.argsort(pvalues, axis=-1, kind="stable")
+        sorted_p = np.take_along_axis(pvalues, order, axis=-1)
+        rank = np.arange(1, pvalues.shape[-1] + 1)
 
-    elif method == "Bonferroni-Holm":
-        values = [(pvalue, i) for i, pvalue in enumerate(pvalues)]
-        values.sort()
-        for rank, vals in enumerate(values):
-            pvalue, i = vals
-            new_pvalues[i] = (n - rank) * pvalue
+        if method in ("Bonferroni-Holm", "Holm"):
+            # step-down: running max from the smallest p value
+            scaled = (n - rank + 1) * sorted_p
+            scaled = np.maximum.accumulate(np.where(rank <= n, scaled, -np.inf), -1)
+        else:
+            if method == "Hochberg":
+                scaled = (n - rank + 1) * sorted_p
+            else:
+                scaled = n / rank * sorted_p
+                if method == "Benjamini-Yekutieli":
+                    harmonic = np.cumsum(1 / rank)
+                    scaled = scaled * harmonic[np.maximum(n - 1, 0)]
+            # step-up: running min from the largest p value
+            scaled = np.where(rank <= n, scaled, np.inf)[..., ::-1]
+            scaled = np.minimum.accumulate(scaled, axis=-1)[..., ::-1]
 
-    elif method == "Benjamini-Hochberg":
-        values = [(pvalue, i) for i, pvalue in enumerate(pvalues)]
-        values.sort()
-        values.reverse()
-        new_values = []
-        for i, vals in enumerate(values):
-            rank = n - i
-            pvalue, index = vals
-            new_values.append((n / rank) * pvalue)
-        for i in range(0, int(n) - 1):
-            if new_values[i] < new_values[i + 1]:
-                new_values[i + 1] = new_values[i]
-        for i, vals in enumerate(values):
-            pvalue, index = vals
-            new_pvalues[index] = new_values[i]
+        adjusted = np.empty_like(pvalues)
+        np.put_along_axis(adjusted, order, scaled, axis=-1)
 
-    return new_pvalues
+    adjusted = np.where(is_nan, np.nan, np.minimum(adjusted, 1))
+    return np.moveaxis(adjusted, -1, axis)
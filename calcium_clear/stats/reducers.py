@@ -0,0 +1,186 @@
+from typing import Callable, Dict, List, Optional, Union
+import warnings
+import numpy as np
+from .auc import auc
+
+Reducer = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+_REDUCERS: Dict[str, Reducer] = {}
+_SEGMENT_KERNELS: Dict[str, str] = {}
+
+
+def register_reducer(
+    name: str,
+    func: Optional[Reducer] = None,
+    overwrite: bool = False,
+    segment: Optional[str] = None,
+):
+    """
+    Registers a vectorized reducer under a name usable as `agg_func` in aggregation functions.
+
+    A reducer is called as func(values, x) and must reduce the last axis of `values`.
+    `values` has shape (..., n_lags) and may contain NaN for missing samples; `x` holds
+    the time of each sample and broadcasts against `values`. Can be used as a decorator.
+
+    Args:
+        name (str): name of the reducer.
+        func (Optional[Reducer]): the reducer. If None, returns a decorator.
+        overwrite (bool): whether to replace an existing reducer of the same name.
+        segment (Optional[str]): name of the `calcium_clear.stats.segments.segment_reduce`
+            kernel computing the same result on contiguous segments, used by grouped
+            aggregations instead of padding. Must have the same NaN semantics as func.
+
+    Returns:
+        The registered reducer, or a decorator registering it.
+
+    Example:
+        >>> @register_reducer("trough")
+        ... def trough(values, x):
+        ...     return np.nanmin(values, axis=-1)
+    """
+
+    def decorator(f: Reducer) -> Reducer:
+        if name in _REDUCERS and not overwrite:
+            raise ValueError(f"A reducer named '{name}' is already registered.")
+        _REDUCERS[name] = f
+        if segment is None:
+            _SEGMENT_KERNELS.pop(name, None)
+        else:
+            _SEGMENT_KERNELS[name] = segment
+        return f
+
+    if func is None:
+        return decorator
+    return decorator(func)
+
+
+def is_reducer(name) -> bool:
+    """Whether `name` is the name of a registered reducer."""
+    return isinstance(name, str) and name in _REDUCERS
+
+
+def segment_kernel(name) -> Optional[str]:
+    """The `segment_reduce` kernel registered with reducer `name`, or None."""
+    if not isinstance(name, str):
+        return None
+    return _SEGMENT_KERNELS.get(name)
+
+
+def list_reducers() -> List[str]:
+    """Names of all registered reducers."""
+    return sorted(_REDUCERS)
+
+
+def get_reducer(name: Union[str, Reducer]) -> Reducer:
+    """
+    Returns a registered reducer by name. Callables are returned unchanged.
+
+    Raises:
+        ValueError: If no reducer of that name is registered.
+    """
+    if callable(name):
+        return name
+    if name not in _REDUCERS:
+        raise ValueError(f"Unknown reducer '{name}'. Available: {list_reducers()}")
+    return _REDUCERS[name]
+
+
+def apply_reducer(
+    reducer: Union[str, Reducer],
+    values: np.ndarray,
+    x: Optional[np.ndarray] = None,
+    axis: int = -1,
+) -> np.ndarray:
+    """
+    Reduces `values` along `axis` with a registered reducer.
+
+    Args:
+        reducer (Union[str, Reducer]): name of a registered reducer, or a reducer.
+        values (np.ndarray): array to reduce.
+        x (Optional[np.ndarray]): time of each sample along `axis`, either 1D or with
+            the shape of `values`. Defaults to the sample index.
+        axis (int): axis to reduce. Defaults to -1.
+
+    Returns:
+        np.ndarray: `values` with `axis` removed.
+    """
+    func = get_reducer(reducer)
+    values = np.moveaxis(np.asarray(values, dtype=float), axis, -1)
+    if x is None:
+        x = np.arange(values.shape[-1], dtype=float)
+    elif np.ndim(x) > 1:
+        x = np.moveaxis(np.asarray(x, dtype=float), axis, -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return func(values, np.asarray(x, dtype=float))
+
+
+def _x_at(x: np.ndarray, idx: np.ndarray, found: np.ndarray) -> np.ndarray:
+    x = np.broadcast_to(x, found.shape + x.shape[-1:])
+    picked = np.take_along_axis(x, idx[..., None], axis=-1)[..., 0]
+    return np.where(found, picked, np.nan)
+
+
+@register_reducer("auc", segment="auc")
+def _auc(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Area under the samples on an x-axis spanning [0, 1], as `stats.auc`. NaN propagates."""
+    return auc(values, to_1=True)
+
+
+@register_reducer("mean", segment="mean")
+def _mean(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Mean of the non-NaN samples."""
+    return np.nanmean(values, axis=-1)
+
+
+@register_reducer("sum", segment="sum")
+def _sum(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Sum of the non-NaN samples."""
+    return np.nansum(values, axis=-1)
+
+
+@register_reducer("max", segment="max")
+def _max(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Maximum of the non-NaN samples."""
+    return np.nanmax(values, axis=-1)
+
+
+@register_reducer("peak", segment="max")
+def _peak(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Maximum of the non-NaN samples."""
+    return np.nanmax(values, axis=-1)
+
+
+@register_reducer("peak_latency")
+def _peak_latency(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """x at the maximum of the non-NaN samples."""
+    found = ~np.isnan(values).all(axis=-1)
+    idx = np.argmax(np.where(np.isnan(values), -np.inf, values), axis=-1)
+    return _x_at(x, idx, found)
+
+
+@register_reducer("time_to_half_max")
+def _time_to_half_max(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """x at the first sample reaching half of the peak."""
+    half_max = np.nanmax(values, axis=-1, keepdims=True) / 2
+    reached = values >= half_max
+    return _x_at(x, np.argmax(reached, axis=-1), reached.any(axis=-1))
+
+
+@register_reducer("slope")
+def _slope(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Least-squares slope of the non-NaN samples against x."""
+    x = np.broadcast_to(x, values.shape)
+    is_valid = ~np.isnan(values)
+    n_valid = is_valid.sum(axis=-1, keepdims=True)
+    x_mean = np.where(is_valid, x, 0).sum(axis=-1, keepdims=True) / n_valid
+    y_mean = np.nansum(values, axis=-1, keepdims=True) / n_valid
+    dx = np.where(is_valid, x - x_mean, 0)
+    dy = np.where(is_valid, values - y_mean, 0)
+    return (dx * dy).sum(axis=-1) / (dx**2).sum(axis=-1)
+
+
+@register_reducer("area_above_baseline")
+def _area_above_baseline(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Trapezoid area over x of the non-NaN samples above zero."""
+    return auc(np.clip(values, 0, None), x=x, skipna=True)
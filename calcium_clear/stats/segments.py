@@ -0,0 +1,176 @@
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from .reducers import apply_reducer, is_reducer, segment_kernel
+
+SEGMENT_REDUCERS = ("auc", "mean", "max", "sum")
+
+
+def segment_codes(
+    df: pd.DataFrame, keys: list
+) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    """
+    Sorts the rows of a dataframe into contiguous segments, one per group of `keys`.
+
+    Rows keep their original order within a segment (the sort is stable) and segments
+    are ordered as `df.groupby(keys)` orders its groups. Rows with a missing key are dropped.
+
+    Args:
+        df (pd.DataFrame): dataframe to segment.
+        keys (list): columns to group by.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, pd.Index]: the row order, the start of every segment
+        in that order, and the index of group keys of every segment.
+    """
+    grouper = df.groupby(keys, sort=True)
+    codes = grouper.ngroup().to_numpy()
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.diff(sorted_codes, prepend=-1) != 0)
+    return order, starts, grouper.size().index
+
+
+def segment_reduce(
+    values: np.ndarray,
+    starts: np.ndarray,
+    how: str = "auc",
+    to_1: bool = True,
+) -> np.ndarray:
+    """
+    Reduces contiguous segments of an array along its first axis in one vectorized pass.
+
+    Results match applying `calcium_clear.stats.auc` (for "auc") or the pandas reduction
+    of the same name to every segment: "mean", "max" and "sum" skip NaN, while "auc"
+    propagates NaN and is NaN for segments with fewer than two values.
+
+    Args:
+        values (np.ndarray): array of shape (n,) or (n, k), sorted by segment.
+        starts (np.ndarray): index of the first element of every segment, increasing.
+        how (str): one of "auc", "mean", "max" or "sum". Defaults to "auc".
+        to_1 (bool): for "auc", integrate over an x-axis spanning [0, 1] rather than
+            one unit per sample. Defaults to True.
+
+    Returns:
+        np.ndarray: array of shape (n_segments,) or (n_segments, k).
+    """
+    values = np.asarray(values, dtype=float)
+    if len(starts) == 0:
+        return np.empty((0,) + values.shape[1:])
+    ends = np.append(starts[1:], len(values))
+    counts = (ends - starts).reshape((-1,) + (1,) * (values.ndim - 1))
+    is_nan = np.isnan(values)
+
+    if how == "auc":
+        # trapezoid rule with unit spacing: sum of values minus half of both endpoints
+        trapz = np.add.reduceat(values, starts, axis=0) - (
+            values[starts] + values[ends - 1]
+        ) / 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if to_1:
+                trapz = trapz / (counts - 1)
+        return np.where(counts > 1, trapz, np.nan)
+
+    filled = np.where(is_nan, 0, values)
+    if how == "sum":
+        return np.add.reduceat(filled, starts, axis=0)
+    elif how == "mean":
+        n_valid = np.add.reduceat(~is_nan, starts, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.add.reduceat(filled, starts, axis=0) / n_valid
+    elif how == "max":
+        return np.fmax.reduceat(values, starts, axis=0)
+    raise ValueError(f"how must be one of {list(SEGMENT_REDUCERS)}, not {how}")
+
+
+def segment_pad(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Stacks contiguous segments of an array into a NaN-padded dense array.
+
+    Args:
+        values (np.ndarray): array of shape (n,) or (n, k), sorted by segment.
+        starts (np.ndarray): index of the first element of every segment, increasing.
+
+    Returns:
+        np.ndarray: array of shape (n_segments, max_length) or (n_segments, max_length, k).
+    """
+    values = np.asarray(values, dtype=float)
+    ends = np.append(starts[1:], len(values))
+    lengths = ends - starts
+    max_length = lengths.max(initial=0)
+    padded = np.full((len(starts), max_length) + values.shape[1:], np.nan)
+    segment = np.repeat(np.arange(len(starts)), lengths)
+    position = np.arange(len(values)) - np.repeat(starts, lengths)
+    padded[segment, position] = values
+    return padded
+
+
+def reduce_segments(
+    how: str,
+    values: np.ndarray,
+    starts: np.ndarray,
+    x: Optional[np.ndarray] = None,
+    to_1: bool = True,
+) -> np.ndarray:
+    """
+    Reduces contiguous segments of an array along its first axis with a registered reducer.
+
+    Reducers registered with a `segment` kernel run with `segment_reduce`; others run on
+    the segments stacked into a NaN-padded array with `apply_reducer`.
+
+    Args:
+        how (str): name of a registered reducer.
+        values (np.ndarray): array of shape (n,) or (n, k), sorted by segment.
+        starts (np.ndarray): index of the first element of every segment, increasing.
+        x (Optional[np.ndarray]): (n,) time of every sample, sorted as values.
+        to_1 (bool): for the "auc" kernel, integrate over an x-axis spanning [0, 1]. Defaults to True.
+
+    Returns:
+        np.ndarray: array of shape (n_segments,) or (n_segments, k).
+    """
+    if not is_reducer(how):
+        raise ValueError(f"Unknown reducer '{how}'.")
+    kernel = segment_kernel(how)
+    if kernel is not None:
+        return segment_reduce(values, starts, how=kernel, to_1=to_1)
+    padded = segment_pad(values, starts)
+    if x is not None:
+        x = segment_pad(x, starts).reshape(padded.shape[:2] + (1,) * (padded.ndim - 2))
+    return apply_reducer(how, padded, x=x, axis=1)
+
+
+def reduce_by_group(
+    df: pd.DataFrame,
+    keys: list,
+    value_col: str,
+    how: str,
+    x_col: Optional[str] = None,
+    to_1: bool = True,
+) -> pd.Series:
+    """
+    Reduces `value_col` of every group of `keys` with a registered reducer.
+
+    Groups are sorted into contiguous segments and reduced with `reduce_segments`,
+    with `x_col` as the time of each sample.
+
+    Args:
+        df (pd.DataFrame): long-format dataframe.
+        keys (list): columns to group by.
+        value_col (str): column to reduce.
+        how (str): name of the reducer.
+        x_col (Optional[str]): column holding the time of each sample.
+        to_1 (bool): for "auc", integrate over an x-axis spanning [0, 1]. Defaults to True.
+
+    Returns:
+        pd.Series: reduced values indexed by the group keys, named `value_col`.
+    """
+    if not is_reducer(how):
+        raise ValueError(f"Unknown reducer '{how}'.")
+    order, starts, index = segment_codes(df, keys)
+    values = df[value_col].to_numpy(dtype=float)[order]
+    x = None
+    if x_col is not None:
+        x = df[x_col].to_numpy(dtype=float)[order]
+    reduced = reduce_segments(how, values, starts, x=x, to_1=to_1)
+    return pd.Series(reduced, index=index, name=value_col)
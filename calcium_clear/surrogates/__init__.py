@@ -1,4 +1,22 @@
-from .rotation import rotate_traces
-from .replace import sample_traces
+from .rotation import rotate_traces, CircularShift, circular_shift_surrogates
+from .replace import (
+    sample_traces,
+    sample_traces_index,
+    ensemble_mean,
+    ensemble_average_trace,
+)
+from .runner import run_surrogates
+from .cache import NullCache, null_cache_key
 
-__all__ = ["rotate_traces", "sample_traces"]
+__all__ = [
+    "rotate_traces",
+    "CircularShift",
+    "circular_shift_surrogates",
+    "sample_traces",
+    "sample_traces_index",
+    "ensemble_mean",
+    "ensemble_average_trace",
+    "run_surrogates",
+    "NullCache",
+    "null_cache_key",
+]
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+from typing import Callable, Optional
+
+
+def null_cache_key(*arrays: np.ndarray, **params) -> str:
+    """
+    Content hash of arrays (values, shape and dtype) and keyword parameters.
+
+    Args:
+        *arrays (np.ndarray): arrays the null distribution depends on, e.g. traces and events.
+        **params: other inputs, e.g. the statistic name and surrogate parameters.
+            Their `repr` must be stable across sessions.
+
+    Returns:
+        str: hexadecimal SHA-1 digest.
+    """
+    digest = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(repr((arr.shape, arr.dtype.str)).encode())
+        digest.update(arr.tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+class NullCache:
+    """
+    On-disk cache of null distributions stored as memory-mapped `.npy` files.
+
+    Entries are keyed by `null_cache_key` and loaded with `mmap_mode="r"`, so a hit costs
+    only opening the file. When the cache grows beyond `max_bytes`, the least recently
+    used entries (by file modification time, refreshed on every hit) are removed.
+
+    Args:
+        cache_dir (str): directory holding the cache. Created if missing.
+        max_bytes (int): size limit of the cache in bytes. Defaults to 1 GiB.
+
+    Example:
+        >>> cache = NullCache("~/.cache/calcium_clear")
+        >>> key = null_cache_key(values, events, statistic="mean_diff", n_shuffles=1000, seed=0)
+        >>> null = cache.get_or_compute(key, lambda: compute_null(...))
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns the memory-mapped entry of `key`, or None if it is not cached."""
+        path = self._path(key)
+        try:
+            arr = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return arr
+
+    def put(self, key: str, arr: np.ndarray) -> np.ndarray:
+        """
+        Stores an entry and evicts least recently used entries beyond the size limit.
+
+        Returns:
+            np.ndarray: the stored entry, memory-mapped from disk.
+        """
+        # write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(arr))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(keep=key)
+        return np.load(self._path(key), mmap_mode="r")
+
+    def get_or_compute(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Returns the entry of `key`, computing and storing it with `compute()` on a miss."""
+        arr = self.get(key)
+        if arr is None:
+            arr = self.put(key, compute())
+        return arr
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name[: -len(".npy")]))
+        return sorted(entries)
+
+    @property
+    def size(self) -> int:
+        """Total size of cached entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, keep: Optional[str] = None):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+
+    def remove(self, key: str):
+        """Removes the entry of `key` if it is cached."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Removes all cached entries."""
+        for _, _, key in self._entries():
+            self.remove(key)
@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+from typing import List, Optional, Tuple, Union
+from calcium_clear.align.epochs import Epochs
 
 
 def sample_traces(
@@ -9,13 +11,14 @@ def sample_traces(
     frac_retained: float | None = None,
     with_replacement: bool = False,
     other_cols: list | None = None,
+    rng: Optional[Union[int, np.random.Generator]] = None,
 ) -> pd.DataFrame:
     """
     Sample columns from a wide-format DataFrame, retaining specified columns.
 
-    This function pops the time series and other specified columns from the input DataFrame,
+    This function takes the time series and other specified columns from the input DataFrame,
     then samples the remaining columns. The retained and sampled columns are concatenated
-    and returned.
+    and returned. The input DataFrame is not modified.
 
     Args:
         df_wide (pd.DataFrame): The input DataFrame in wide format.
@@ -24,6 +27,8 @@ def sample_traces(
         frac_retained (float | None, optional): The fraction of columns to retain. If None, all columns are retained. Defaults to None.
         with_replacement (bool, optional): Whether to sample with replacement. Defaults to False.
         other_cols (list | None, optional): List of other column names to retain. If None, no other columns are retained. Defaults to None.
+        rng (Optional[Union[int, np.random.Generator]], optional): seed or generator. If None, the global
+            `np.random` state is used. Defaults to None.
 
     Returns:
         pd.DataFrame: The output DataFrame with the retained and sampled columns.
@@ -31,18 +36,146 @@ def sample_traces(
     Examples:
         >>> sample_traces(df, "time", 2, 0.5, True, ["col1", "col2"])
     """
-    time_ser = df_wide.pop(time_col)
     match other_cols:
         case None:
-            retained_cols = [time_ser]
+            retained_cols = [time_col]
         case _:
-            retained_cols = [time_ser] + [df_wide.pop(col) for col in other_cols]
+            retained_cols = [time_col] + list(other_cols)
 
-    df_retained = pd.concat(retained_cols, axis="columns")
+    df_retained = df_wide[retained_cols]
 
-    df_sub = df_wide.sample(
-        frac=frac_retained, n=n_retained, replace=with_replacement, axis="columns"
+    df_sub = df_wide.drop(columns=retained_cols).sample(
+        frac=frac_retained,
+        n=n_retained,
+        replace=with_replacement,
+        axis="columns",
+        random_state=rng,
     )
 
     df_out = pd.concat([df_retained, df_sub], axis="columns")
     return df_out
+
+
+def _sample_without_replacement(
+    rng: np.random.Generator, n_resamples: int, n_columns: int, n_selected: int
+) -> np.ndarray:
+    """
+    (n_resamples, n_selected) column positions drawn without replacement within every row.
+
+    Rows are shuffled in O(n_columns) with `Generator.permuted` rather than sorted.
+    When few columns are selected, only the first n_selected positions of every row are
+    shuffled with a vectorized partial Fisher-Yates pass, in O(n_selected) steps.
+    """
+    pool = np.tile(np.arange(n_columns), (n_resamples, 1))
+    if 2 * n_selected >= n_columns:
+        rng.permuted(pool, axis=1, out=pool)
+    else:
+        rows = np.arange(n_resamples)
+        for j in range(n_selected):
+            swap = rng.integers(j, n_columns, size=n_resamples)
+            pool[rows, j], pool[rows, swap] = pool[rows, swap], pool[rows, j]
+    return np.ascontiguousarray(pool[:, :n_selected])
+
+
+def sample_traces_index(
+    df_wide: pd.DataFrame,
+    n_resamples: int,
+    time_col: str = "time",
+    n_retained: int | None = None,
+    frac_retained: float | None = None,
+    with_replacement: bool = False,
+    other_cols: list | None = None,
+    rng: Optional[Union[int, np.random.Generator]] = None,
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Draws an ensemble of column resamples as an integer index matrix instead of DataFrames.
+
+    Row r of the returned matrix holds the positions, in the returned column list, of the
+    columns sampled in resample r. Statistics of the ensemble can be computed by gathering
+    from one shared array, e.g. with `ensemble_mean`, so memory is O(n_resamples x n_selected)
+    integers rather than one DataFrame per resample.
+
+    Args:
+        df_wide (pd.DataFrame): The input DataFrame in wide format. It is not modified.
+        n_resamples (int): The number of resamples.
+        time_col (str, optional): The name of the time column. Defaults to "time".
+        n_retained (int | None, optional): The number of columns to retain per resample. Defaults to None.
+        frac_retained (float | None, optional): The fraction of columns to retain per resample.
+            If both are None, all columns are retained. Defaults to None.
+        with_replacement (bool, optional): Whether to sample with replacement. Defaults to False.
+        other_cols (list | None, optional): List of other column names excluded from sampling. Defaults to None.
+        rng (Optional[Union[int, np.random.Generator]], optional): seed or generator. Defaults to None.
+
+    Returns:
+        Tuple[np.ndarray, List[str]]: the (n_resamples, n_selected) index matrix and the sampled columns.
+
+    Examples:
+        >>> index, columns = sample_traces_index(df, 5000, with_replacement=True, rng=0)
+        >>> means = ensemble_mean(df[columns].to_numpy(), index)  # (5000, n_samples)
+    """
+    if n_retained is not None and frac_retained is not None:
+        raise ValueError("Please enter a value for `frac_retained` OR `n_retained`, not both")
+    excluded = {time_col} | set(other_cols or [])
+    columns = [c for c in df_wide.columns if c not in excluded]
+    n_columns = len(columns)
+    if frac_retained is not None:
+        n_retained = round(frac_retained * n_columns)
+    elif n_retained is None:
+        n_retained = n_columns
+    if not with_replacement and n_retained > n_columns:
+        raise ValueError(
+            "Cannot take a larger sample than the number of columns without replacement"
+        )
+
+    rng = np.random.default_rng(rng)
+    if with_replacement:
+        index = rng.integers(0, n_columns, size=(n_resamples, n_retained))
+    else:
+        index = _sample_without_replacement(rng, n_resamples, n_columns, n_retained)
+    return index, columns
+
+
+def ensemble_mean(values: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """
+    Mean over the sampled columns of every resample of an index ensemble, ignoring NaN.
+
+    Resamples are turned into per-column counts, so all means are one weighted sum over
+    the columns of the shared array, without gathering a copy per resample.
+
+    Args:
+        values (np.ndarray): Shared array with columns on the last axis, e.g. (n_samples, n_neurons).
+        index (np.ndarray): (n_resamples, n_selected) index matrix from `sample_traces_index`.
+
+    Returns:
+        np.ndarray: Means with shape (n_resamples,) + values.shape[:-1].
+    """
+    values = np.asarray(values, dtype=float)
+    n_resamples, n_columns = len(index), values.shape[-1]
+    offsets = (np.arange(n_resamples) * n_columns)[:, None]
+    counts = np.bincount(
+        (index + offsets).reshape(-1), minlength=n_resamples * n_columns
+    ).reshape(n_resamples, n_columns)
+
+    is_valid = ~np.isnan(values)
+    totals = np.tensordot(counts, np.where(is_valid, values, 0), axes=([1], [-1]))
+    n_valid = np.tensordot(counts, is_valid.astype(float), axes=([1], [-1]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return totals / n_valid
+
+
+def ensemble_average_trace(epochs: Epochs, index: np.ndarray) -> np.ndarray:
+    """
+    Population average trace of every resample of an index ensemble of neurons.
+
+    Args:
+        epochs (Epochs): aligned traces from `align_to_events_array`, with the columns
+            indexed by `index` as neurons.
+        index (np.ndarray): (n_resamples, n_selected) index matrix from `sample_traces_index`.
+
+    Returns:
+        np.ndarray: (n_resamples, n_lags) event- then neuron-averaged traces.
+    """
+    is_valid = ~np.isnan(epochs.data)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(is_valid, epochs.data, 0).sum(axis=0) / is_valid.sum(axis=0)
+    return ensemble_mean(average, index)
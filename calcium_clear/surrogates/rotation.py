@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from typing import Optional
+from typing import Iterator, Optional, Union
 
 
 def rotate_traces(
@@ -8,6 +8,7 @@ def rotate_traces(
     increment: Optional[int] = None,
     time_col: str = "time",
     copy: bool = True,
+    rng: Optional[Union[int, np.random.Generator]] = None,
 ) -> pd.DataFrame:
     """
     Rotate the traces in a DataFrame.
@@ -19,6 +20,8 @@ def rotate_traces(
         df (pd.DataFrame): The DataFrame containing the traces to rotate.
         increment (int, optional): The number of positions to rotate the traces. If not provided, a random increment is chosen. Defaults to None.
         time_col (str, optional): The name of the time column. Defaults to "time".
+        rng (Optional[Union[int, np.random.Generator]], optional): seed or generator of the random increment.
+            If None, the global `np.random` state is used. Defaults to None.
 
     Returns:
         pd.DataFrame: The DataFrame with rotated traces.
@@ -37,8 +40,10 @@ def rotate_traces(
     if time_col not in df.columns:
         raise ValueError(f"'{time_col}' not found in DataFrame's columns.")
 
-    if increment is None:
+    if increment is None and rng is None:
         increment = np.random.randint(0, len(df) - 1)
+    elif increment is None:
+        increment = np.random.default_rng(rng).integers(0, len(df) - 1)
     else:
         increment = increment % len(df)  # negative increments
 
@@ -55,3 +60,154 @@ def rotate_traces(
     rotated_df[time_col] = time_data
     rotated_df = rotated_df[[time_col] + list(other_data.columns)]
     return rotated_df
+
+
+class CircularShift:
+    """
+    A circularly shifted surrogate of a recording, stored as shifts rather than data.
+
+    Row i of neuron j in the surrogate is row (i - shifts[j]) % n_samples of the original,
+    as with `np.roll`. The original array is shared by all surrogates and only gathered
+    on request, either in full or at selected rows.
+
+    Args:
+        values (np.ndarray): The original (n_samples, n_neurons) traces.
+        shifts (np.ndarray): Shift of every neuron, shape (n_neurons,).
+        columns (list): Neuron names.
+        time (np.ndarray): Time of every sample.
+        time_col (str): The name of the time column. Defaults to "time".
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        shifts: np.ndarray,
+        columns: list,
+        time: np.ndarray,
+        time_col: str = "time",
+    ):
+        self.values = values
+        self.shifts = shifts
+        self.columns = columns
+        self.time = time
+        self.time_col = time_col
+
+    @property
+    def n_samples(self) -> int:
+        return self.values.shape[0]
+
+    def index(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rows of the original array gathered for each surrogate row and neuron.
+
+        Args:
+            rows (np.ndarray, optional): Surrogate rows, of any shape. Defaults to all rows.
+
+        Returns:
+            np.ndarray: Original rows with shape rows.shape + (n_neurons,).
+        """
+        if rows is None:
+            rows = np.arange(self.n_samples)
+        rows = np.asarray(rows)
+        return (rows[..., None] - self.shifts) % self.n_samples
+
+    def take(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Gathers surrogate values, e.g. only the rows of event windows.
+
+        Args:
+            rows (np.ndarray, optional): Surrogate rows, of any shape. Defaults to all rows.
+
+        Returns:
+            np.ndarray: Values with shape rows.shape + (n_neurons,).
+        """
+        return self.values[self.index(rows), np.arange(self.values.shape[1])]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materializes the surrogate in the format returned by `rotate_traces`."""
+        df = pd.DataFrame(self.take(), columns=self.columns)
+        df.insert(0, self.time_col, self.time)
+        return df
+
+
+def circular_shift_surrogates(
+    df: pd.DataFrame,
+    n_surrogates: int,
+    time_col: str = "time",
+    independent: bool = True,
+    min_shift: int = 1,
+    rng: Optional[Union[int, np.random.Generator]] = None,
+) -> Iterator[CircularShift]:
+    """
+    Lazily yields circularly shifted surrogates of the traces in a DataFrame.
+
+    The traces are converted to an array once and shared by all surrogates; each
+    surrogate only holds its shifts. With `independent=True` every neuron gets its own
+    shift, destroying correlations between neurons, which is the appropriate null for
+    single-neuron tests. Otherwise all neurons share a shift, as with `rotate_traces`.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the traces.
+        n_surrogates (int): The number of surrogates to yield.
+        time_col (str, optional): The name of the time column. Defaults to "time".
+        independent (bool, optional): Whether to shift every neuron independently. Defaults to True.
+        min_shift (int, optional): The smallest shift, in samples, in either direction. Shifts are drawn
+            uniformly from [min_shift, n_samples - min_shift], so every rotation except the identity
+            is possible with min_shift=1. Must be at least 1. Defaults to 1.
+        rng (Optional[Union[int, np.random.Generator]], optional): seed or generator of the shifts. Defaults to None.
+
+    Yields:
+        CircularShift: One surrogate at a time.
+
+    Raises:
+        ValueError: If `time_col` is not found, `min_shift` is below 1 (which would allow
+            the identity rotation) or `min_shift` leaves no possible shift.
+
+    Examples:
+        >>> for surrogate in circular_shift_surrogates(df, 1000, rng=0):
+        ...     windows = surrogate.take(event_rows)
+    """
+    if time_col not in df.columns:
+        raise ValueError(f"'{time_col}' not found in DataFrame's columns.")
+    columns = [c for c in df.columns if c != time_col]
+    yield from _circular_shifts(
+        df[columns].to_numpy(),
+        df[time_col].to_numpy(),
+        columns,
+        time_col=time_col,
+        n_surrogates=n_surrogates,
+        independent=independent,
+        min_shift=min_shift,
+        rng=rng,
+    )
+
+
+def _circular_shifts(
+    values: np.ndarray,
+    time: np.ndarray,
+    columns: list,
+    time_col: str,
+    n_surrogates: int,
+    independent: bool = True,
+    min_shift: int = 1,
+    rng: Optional[Union[int, np.random.Generator]] = None,
+) -> Iterator[CircularShift]:
+    """`circular_shift_surrogates` of traces already extracted to an array shared by all surrogates."""
+    n_samples = len(values)
+    if not 1 <= min_shift <= n_samples - min_shift:
+        raise ValueError(
+            f"min_shift must be between 1 and half the number of samples, not {min_shift}"
+        )
+    rng = np.random.default_rng(rng)
+    size = len(columns) if independent else 1
+
+    for _ in range(n_surrogates):
+        # with min_shift >= 1, every shift of the closed range is a distinct rotation
+        shifts = rng.integers(min_shift, n_samples - min_shift, size=size, endpoint=True)
+        yield CircularShift(
+            values,
+            np.broadcast_to(shifts, len(columns)),
+            columns=columns,
+            time=time,
+            time_col=time_col,
+        )
@@ -0,0 +1,118 @@
+import pandas as pd
+import numpy as np
+from typing import Any, Callable, Optional, Union
+from joblib import Parallel, delayed
+from .rotation import _circular_shifts
+from .replace import sample_traces_index
+
+SURROGATE_METHODS = ("circular_shift", "sample")
+
+
+def _run_chunk(
+    statistic: Callable[[Any], np.ndarray],
+    n_surrogates: int,
+    seed: np.random.SeedSequence,
+    method: str,
+    shared: dict,
+    surrogate_kwargs: dict,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if method == "circular_shift":
+        batch = list(
+            _circular_shifts(
+                n_surrogates=n_surrogates, rng=rng, **shared, **surrogate_kwargs
+            )
+        )
+    else:
+        batch, _ = sample_traces_index(
+            n_resamples=n_surrogates, rng=rng, **shared, **surrogate_kwargs
+        )
+    return np.asarray(statistic(batch))
+
+
+def _spawn_seeds(seed: np.random.SeedSequence, n: int) -> list:
+    """The first n children of `seed`, as `seed.spawn(n)` on a fresh copy, without mutating it."""
+    return [
+        np.random.SeedSequence(
+            seed.entropy, spawn_key=seed.spawn_key + (i,), pool_size=seed.pool_size
+        )
+        for i in range(n)
+    ]
+
+
+def run_surrogates(
+    df: pd.DataFrame,
+    statistic: Callable[[Any], np.ndarray],
+    n_surrogates: int,
+    method: str = "circular_shift",
+    batch_size: int = 100,
+    n_jobs: int = 1,
+    seed: Optional[Union[int, np.random.SeedSequence]] = None,
+    time_col: str = "time",
+    surrogate_kwargs: Optional[dict] = None,
+) -> np.ndarray:
+    """
+    Evaluates a statistic over surrogates of a recording in reproducible parallel batches.
+
+    Surrogates are split into fixed chunks of `batch_size`, and every chunk draws its
+    surrogates from its own child stream of `np.random.SeedSequence(seed)`. Chunks
+    depend only on `seed` and `batch_size`, so results are bit-identical for any `n_jobs`;
+    a SeedSequence passed as `seed` is not modified. The traces are extracted to one
+    array shared by all chunks, which joblib memory-maps once for worker processes.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the traces.
+        statistic (Callable[[Any], np.ndarray]): Function of one batch of surrogates returning
+            an array with one row per surrogate. For "circular_shift" a batch is a list of
+            `CircularShift`; for "sample" it is a (batch, n_selected) index matrix from
+            `sample_traces_index` into the non-time columns.
+        n_surrogates (int): The total number of surrogates.
+        method (str, optional): "circular_shift" or "sample". Defaults to "circular_shift".
+        batch_size (int, optional): The number of surrogates per chunk. Defaults to 100.
+        n_jobs (int, optional): The number of processes evaluating chunks. Defaults to 1.
+        seed (Optional[Union[int, np.random.SeedSequence]], optional): base seed. Defaults to None.
+        time_col (str, optional): The name of the time column. Defaults to "time".
+        surrogate_kwargs (Optional[dict], optional): Extra arguments of `circular_shift_surrogates`
+            or `sample_traces_index`. Defaults to None.
+
+    Returns:
+        np.ndarray: The statistic of every surrogate, stacked along the first axis.
+
+    Examples:
+        >>> def mean_trace(batch):
+        ...     return np.stack([s.take().mean(axis=1) for s in batch])
+        >>> null = run_surrogates(df, mean_trace, 5000, n_jobs=-1, seed=0)
+    """
+    if method not in SURROGATE_METHODS:
+        raise ValueError(f"method must be one of {list(SURROGATE_METHODS)}, not {method}")
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    if time_col not in df.columns:
+        raise ValueError(f"'{time_col}' not found in DataFrame's columns.")
+    if method == "circular_shift":
+        columns = [c for c in df.columns if c != time_col]
+        shared = dict(
+            values=df[columns].to_numpy(),
+            time=df[time_col].to_numpy(),
+            columns=columns,
+            time_col=time_col,
+        )
+    else:
+        # column resamples only depend on the column names
+        shared = dict(df_wide=df.iloc[:0], time_col=time_col)
+    sizes = [
+        min(batch_size, n_surrogates - start)
+        for start in range(0, n_surrogates, batch_size)
+    ]
+    tasks = (
+        delayed(_run_chunk)(
+            statistic,
+            n_surrogates=size,
+            seed=child,
+            method=method,
+            shared=shared,
+            surrogate_kwargs=surrogate_kwargs or {},
+        )
+        for size, child in zip(sizes, _spawn_seeds(seed, len(sizes)))
+    )
+    return np.concatenate(Parallel(n_jobs=n_jobs)(tasks))
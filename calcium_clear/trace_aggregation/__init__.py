@@ -9,3 +9,15 @@ from .prepost_combined import (
 from .prepost_compare import (
     prepost_diff,
 )
+from .windows import (
+    window_agg,
+    window_agg_long,
+)
+from .single_trial import (
+    single_trial_arrays,
+    single_trial_metrics,
+)
+from .over_trials import (
+    over_trials_metrics,
+    trial_reliability,
+)
@@ -0,0 +1,92 @@
+import pandas as pd
+from typing import Optional, Tuple
+import numpy as np
+import warnings
+from calcium_clear.align.epochs import Epochs
+from .single_trial import _lag_mask, single_trial_arrays
+
+
+def trial_reliability(
+    epochs: Epochs, window: Optional[Tuple[float, float]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trial-to-trial reliability: the mean Pearson correlation over all pairs of trials.
+
+    Each trial's trace in `window` is centered and scaled to unit norm, so the sum of
+    all pairwise correlations is |sum of traces|^2 minus the number of trials. This
+    gives the exact mean over all pairs in O(n_trials x n_lags) per neuron.
+    Trials with missing or constant values in the window are excluded.
+
+    Args:
+        epochs (Epochs): aligned traces from `align_to_events_array`.
+        window (Optional[Tuple[float, float]], optional): half-open [start, stop) window of aligned time.
+            Defaults to all lags.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: reliability and number of trials used, each of shape (n_neurons,).
+        Reliability is NaN for neurons with fewer than two usable trials.
+    """
+    data = epochs.data
+    if window is not None:
+        data = data[:, _lag_mask(epochs, window)]
+    data = data.astype(float)
+
+    centered = data - data.mean(axis=1, keepdims=True)
+    norm = np.sqrt((centered**2).sum(axis=1, keepdims=True))
+    usable = np.isfinite(norm) & (norm > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        unit = np.where(usable, centered / norm, 0)
+
+    n_trials = usable[:, 0].sum(axis=0)
+    summed = (unit.sum(axis=0) ** 2).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        reliability = (summed - n_trials) / (n_trials * (n_trials - 1))
+    return np.where(n_trials > 1, reliability, np.nan), n_trials
+
+
+def over_trials_metrics(
+    epochs: Epochs,
+    baseline: Tuple[float, float] = (-np.inf, 0),
+    response: Tuple[float, float] = (0, np.inf),
+    amplitude_func: str = "mean",
+    latency_func: str = "peak_latency",
+    created_neuron_col: str = "neuron",
+) -> pd.DataFrame:
+    """
+    Summarizes single-trial responses of every neuron across trials.
+
+    Args:
+        epochs (Epochs): aligned traces from `align_to_events_array`.
+        baseline (Tuple[float, float], optional): half-open [start, stop) baseline window of aligned time.
+            Defaults to all lags before the event.
+        response (Tuple[float, float], optional): half-open [start, stop) response window of aligned time.
+            Defaults to all lags from the event on.
+        amplitude_func (str, optional): registered reducer measuring the response. Defaults to "mean".
+        latency_func (str, optional): registered reducer measuring the latency. Defaults to "peak_latency".
+        created_neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+
+    Returns:
+        pd.DataFrame: one row per neuron with the mean and std (ddof=1) of amplitude and latency
+        across trials, and the reliability of the response window with its number of trials.
+    """
+    _, amplitude, latency = single_trial_arrays(
+        epochs,
+        baseline=baseline,
+        response=response,
+        amplitude_func=amplitude_func,
+        latency_func=latency_func,
+    )
+    reliability, n_trials = trial_reliability(epochs, window=response)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return pd.DataFrame(
+            {
+                created_neuron_col: epochs.neurons,
+                "amplitude_mean": np.nanmean(amplitude, axis=0),
+                "amplitude_std": np.nanstd(amplitude, axis=0, ddof=1),
+                "latency_mean": np.nanmean(latency, axis=0),
+                "latency_std": np.nanstd(latency, axis=0, ddof=1),
+                "reliability": reliability,
+                "n_trials": n_trials,
+            }
+        )
@@ -2,7 +2,8 @@ import pandas as pd
 from typing import Optional, Union, Callable
 import numpy as np
 from calcium_clear.stats import auc
-from functools import partial
+from calcium_clear.stats.reducers import is_reducer
+from calcium_clear.stats.segments import reduce_by_group
 from typing import Any
 
 
@@ -32,33 +33,87 @@ def _event_agg_groupby(
     post_indicator: str = "post",
     time_sep: float = 0,
 ) -> pd.DataFrame:
-    if agg_func == "auc_post_minus_pre":
-        agg_func = partial(
-            auc_post_minus_pre,
+    if event_idx_col is None:
+        event_idx_col = "event_idx"
+        df_aligned_long[event_idx_col] = 0
+    df_aligned_long = df_aligned_long.assign(
+        **{
+            created_pre_post_col: lambda x: np.where(
+                x[aligned_time_col] < time_sep, pre_indicator, post_indicator
+            )
+        }
+    )
+
+    reducer = _post_minus_pre_reducer(agg_func)
+    if reducer is not None:
+        return _post_minus_pre_vectorized(
+            df_aligned_long,
+            reducer=reducer,
+            event_idx_col=event_idx_col,
+            neuron_col=neuron_col,
+            value_col=value_col,
+            aligned_time_col=aligned_time_col,
             prepost_col=created_pre_post_col,
             pre_indicator=pre_indicator,
             post_indicator=post_indicator,
-            value_col=value_col,
         )
+    elif is_reducer(agg_func):
+        return reduce_by_group(
+            df_aligned_long,
+            [event_idx_col, neuron_col],
+            value_col,
+            how=agg_func,
+            x_col=aligned_time_col,
+        ).rename(None)
     elif not callable(agg_func):
         raise ValueError(
-            f"agg_func must be callable or 'auc_post_minus_pre', not {agg_func}"
+            "agg_func must be callable, a registered reducer or "
+            f"'<reducer>_post_minus_pre', not {agg_func}"
         )
+    return df_aligned_long.groupby([event_idx_col, neuron_col]).apply(agg_func)
 
-    if event_idx_col is None:
-        event_idx_col = "event_idx"
-        df_aligned_long[event_idx_col] = 0
-    return (
-        df_aligned_long.assign(
-            **{
-                created_pre_post_col: lambda x: np.where(
-                    x[aligned_time_col] < time_sep, pre_indicator, post_indicator
-                )
-            }
+
+def _post_minus_pre_reducer(agg_func) -> Optional[str]:
+    """Returns the reducer named by '<reducer>_post_minus_pre', or None."""
+    suffix = "_post_minus_pre"
+    if not isinstance(agg_func, str) or not agg_func.endswith(suffix):
+        return None
+    reducer = agg_func[: -len(suffix)]
+    if is_reducer(reducer):
+        return reducer
+    return None
+
+
+def _post_minus_pre_vectorized(
+    df_aligned_long: pd.DataFrame,
+    reducer: str,
+    event_idx_col: str,
+    neuron_col: str,
+    value_col: str,
+    aligned_time_col: str,
+    prepost_col: str,
+    pre_indicator: str,
+    post_indicator: str,
+) -> pd.Series:
+    """
+    Computes reducer(post) - reducer(pre) for every (event, neuron) group in one vectorized pass.
+
+    The pre and post phases of all groups are reduced together, then subtracted.
+    With reducer="auc" this matches
+    `groupby([event_idx_col, neuron_col]).apply(auc_post_minus_pre)`.
+    """
+    by_phase = (
+        reduce_by_group(
+            df_aligned_long,
+            [event_idx_col, neuron_col, prepost_col],
+            value_col,
+            how=reducer,
+            x_col=aligned_time_col,
         )
-        .groupby([event_idx_col, neuron_col])
-        .apply(agg_func)
+        .unstack(prepost_col)
+        .reindex(columns=[pre_indicator, post_indicator])
     )
+    return (by_phase[post_indicator] - by_phase[pre_indicator]).rename(None)
 
 
 def event_agg_long(
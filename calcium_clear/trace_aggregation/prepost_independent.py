@@ -1,8 +1,8 @@
 import pandas as pd
 from typing import Optional, Union, Callable
 import numpy as np
-from calcium_clear.stats import auc
-from functools import partial
+from calcium_clear.stats.reducers import is_reducer
+from calcium_clear.stats.segments import reduce_by_group
 
 
 def _prepost_agg_groupby(
@@ -21,19 +21,21 @@ def _prepost_agg_groupby(
         event_idx_col = "event_idx"
         df_aligned_long[event_idx_col] = 0
 
-    if agg_func == "auc":
-        agg_func = partial(auc, to_1=True)
-    return (
-        df_aligned_long.assign(
-            **{
-                created_pre_post_col: lambda x: np.where(
-                    x[aligned_time_col] < time_sep, pre_indicator, post_indicator
-                ),
-            }
-        )
-        .groupby([event_idx_col, neuron_col, created_pre_post_col])[value_col]
-        .apply(agg_func)
+    df_aligned_long = df_aligned_long.assign(
+        **{
+            created_pre_post_col: lambda x: np.where(
+                x[aligned_time_col] < time_sep, pre_indicator, post_indicator
+            ),
+        }
     )
+    keys = [event_idx_col, neuron_col, created_pre_post_col]
+
+    # built-in and registered reducers are computed for all groups at once
+    if is_reducer(agg_func):
+        return reduce_by_group(
+            df_aligned_long, keys, value_col, how=agg_func, x_col=aligned_time_col
+        )
+    return df_aligned_long.groupby(keys)[value_col].apply(agg_func)
 
 
 def prepost_agg_long(
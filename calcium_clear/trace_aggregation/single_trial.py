@@ -1,4 +1,102 @@
-# def prepost_diff_single_trial():
-#     ...
+import pandas as pd
+from typing import Tuple
+import numpy as np
+from calcium_clear.align.epochs import Epochs
+from calcium_clear.stats.reducers import apply_reducer
 
-# def single_tri
+
+def _lag_mask(epochs: Epochs, window: Tuple[float, float]) -> np.ndarray:
+    """Lags of `epochs` inside the half-open window [start, stop)."""
+    start, stop = window
+    if start >= stop:
+        raise ValueError("Windows must be (start, stop) pairs with start < stop.")
+    mask = (epochs.lags >= start) & (epochs.lags < stop)
+    if not mask.any():
+        raise ValueError(f"No lags fall inside the window {window}.")
+    return mask
+
+
+def single_trial_arrays(
+    epochs: Epochs,
+    baseline: Tuple[float, float] = (-np.inf, 0),
+    response: Tuple[float, float] = (0, np.inf),
+    amplitude_func: str = "mean",
+    latency_func: str = "peak_latency",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-trial baseline, response amplitude and response latency of every neuron.
+
+    Every metric is one reduction over the lag axis of the epoch tensor, so all
+    trials and neurons are computed together. Amplitude and latency reducers are applied
+    to the response minus the trial's baseline mean, so level reducers ("mean", "peak",
+    "auc") give the response relative to baseline, "area_above_baseline" integrates
+    above the baseline, "time_to_half_max" uses half of the peak above baseline, and
+    shift-invariant reducers ("slope", "peak_latency") are unaffected.
+
+    Args:
+        epochs (Epochs): aligned traces from `align_to_events_array`.
+        baseline (Tuple[float, float], optional): half-open [start, stop) baseline window of aligned time.
+            Defaults to all lags before the event.
+        response (Tuple[float, float], optional): half-open [start, stop) response window of aligned time.
+            Defaults to all lags from the event on.
+        amplitude_func (str, optional): registered reducer measuring the response. Defaults to "mean".
+        latency_func (str, optional): registered reducer measuring the latency. Defaults to "peak_latency".
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: baseline mean, amplitude and latency of the
+        baseline-subtracted response, each of shape (n_events, n_neurons).
+    """
+    baseline_mask = _lag_mask(epochs, baseline)
+    response_mask = _lag_mask(epochs, response)
+    response_lags = epochs.lags[response_mask]
+
+    baseline_mean = apply_reducer("mean", epochs.data[:, baseline_mask], axis=1)
+    response_data = epochs.data[:, response_mask] - baseline_mean[:, None, :]
+    amplitude = apply_reducer(amplitude_func, response_data, x=response_lags, axis=1)
+    latency = apply_reducer(latency_func, response_data, x=response_lags, axis=1)
+    return baseline_mean, amplitude, latency
+
+
+def single_trial_metrics(
+    epochs: Epochs,
+    baseline: Tuple[float, float] = (-np.inf, 0),
+    response: Tuple[float, float] = (0, np.inf),
+    amplitude_func: str = "mean",
+    latency_func: str = "peak_latency",
+    created_event_index_col: str = "event_idx",
+    created_neuron_col: str = "neuron",
+) -> pd.DataFrame:
+    """
+    Computes response amplitude and latency of every neuron on every trial.
+
+    Args:
+        epochs (Epochs): aligned traces from `align_to_events_array`.
+        baseline (Tuple[float, float], optional): half-open [start, stop) baseline window of aligned time.
+            Defaults to all lags before the event.
+        response (Tuple[float, float], optional): half-open [start, stop) response window of aligned time.
+            Defaults to all lags from the event on.
+        amplitude_func (str, optional): registered reducer measuring the response. Defaults to "mean".
+        latency_func (str, optional): registered reducer measuring the latency. Defaults to "peak_latency".
+        created_event_index_col (str, optional): name of event index column. Defaults to "event_idx".
+        created_neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+
+    Returns:
+        pd.DataFrame: one row per (event, neuron) with baseline, amplitude and latency columns.
+    """
+    baseline_mean, amplitude, latency = single_trial_arrays(
+        epochs,
+        baseline=baseline,
+        response=response,
+        amplitude_func=amplitude_func,
+        latency_func=latency_func,
+    )
+    n_events, n_neurons = amplitude.shape
+    return pd.DataFrame(
+        {
+            created_event_index_col: np.repeat(np.arange(n_events), n_neurons),
+            created_neuron_col: np.tile(epochs.neurons, n_events),
+            "baseline": baseline_mean.reshape(-1),
+            "amplitude": amplitude.reshape(-1),
+            "latency": latency.reshape(-1),
+        }
+    )
@@ -0,0 +1,166 @@
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from calcium_clear.stats.reducers import is_reducer
+from calcium_clear.stats.segments import reduce_segments, segment_codes
+
+
+def _agg_name(agg_func: Union[str, Callable]) -> str:
+    return agg_func if isinstance(agg_func, str) else agg_func.__name__
+
+
+def _window_agg_frame(
+    df_aligned_long: pd.DataFrame,
+    windows: Dict[str, Tuple[float, float]],
+    agg_funcs: Union[str, Callable, Sequence[Union[str, Callable]]],
+    aligned_time_col: str,
+    event_idx_col: Optional[str],
+    neuron_col: str,
+    value_col: str,
+    created_window_col: str,
+) -> Tuple[pd.DataFrame, List[str]]:
+    if isinstance(agg_funcs, str) or callable(agg_funcs):
+        agg_funcs = [agg_funcs]
+    if len(windows) == 0:
+        raise ValueError("At least one window is required.")
+    names = list(windows)
+    bounds = np.asarray([windows[name] for name in names], dtype=float)
+    if bounds.shape != (len(names), 2) or (bounds[:, 0] >= bounds[:, 1]).any():
+        raise ValueError("Windows must be (start, stop) pairs with start < stop.")
+
+    if event_idx_col is None:
+        event_idx_col = "event_idx"
+        df_aligned_long = df_aligned_long.assign(**{event_idx_col: 0})
+
+    # assign every lag to its windows once; overlapping windows repeat the lag
+    aligned_time = df_aligned_long[aligned_time_col].to_numpy(dtype=float)
+    is_member = (aligned_time >= bounds[:, [0]]) & (aligned_time < bounds[:, [1]])
+    window_code, rows = np.nonzero(is_member)
+    window_code_col = f"_{created_window_col}_code"
+    df_windowed = (
+        df_aligned_long[[event_idx_col, neuron_col, aligned_time_col, value_col]]
+        .iloc[rows]
+        .assign(**{window_code_col: window_code})
+    )
+    keys = [event_idx_col, neuron_col, window_code_col]
+    order, starts, index = segment_codes(df_windowed, keys)
+    values = df_windowed[value_col].to_numpy(dtype=float)[order]
+
+    x = df_windowed[aligned_time_col].to_numpy(dtype=float)[order]
+    agg_names = []
+    df_agg = index.to_frame(index=False)
+    for agg_func in agg_funcs:
+        name = _agg_name(agg_func)
+        if name in agg_names:
+            raise ValueError(f"Duplicate agg_func '{name}'.")
+        agg_names.append(name)
+        if is_reducer(agg_func):
+            df_agg[name] = reduce_segments(agg_func, values, starts, x=x)
+        elif callable(agg_func):
+            df_agg[name] = (
+                df_windowed.groupby(keys)[value_col].apply(agg_func).to_numpy()
+            )
+        else:
+            raise ValueError(f"Unknown agg_func '{agg_func}'.")
+
+    df_agg = df_agg.drop(columns=[window_code_col])
+    df_agg.insert(
+        2,
+        created_window_col,
+        pd.Categorical.from_codes(index.get_level_values(2), categories=names),
+    )
+    return df_agg, agg_names
+
+
+def window_agg_long(
+    df_aligned_long: pd.DataFrame,
+    windows: Dict[str, Tuple[float, float]],
+    agg_funcs: Union[str, Callable, Sequence[Union[str, Callable]]] = "auc",
+    aligned_time_col: str = "aligned_time",
+    event_idx_col: Optional[str] = "event_idx",
+    neuron_col: str = "neuron",
+    value_col: str = "value",
+    created_window_col: str = "window",
+) -> pd.DataFrame:
+    """
+    Aggregates aligned traces in several named windows with several reducers in one pass.
+
+    Lags are assigned to windows once and every (window x reducer) metric is computed
+    for all events and neurons together. Windows are half-open, [start, stop), as the
+    pre window of `prepost_agg`, and may overlap.
+
+    Args:
+        df_aligned_long (pd.DataFrame): long-format aligned dataframe
+        windows (Dict[str, Tuple[float, float]]): (start, stop) aligned times of each named window,
+            e.g. {"baseline": (-2, 0), "early": (0, 1), "late": (1, 3)}
+        agg_funcs (Union[str, Callable, Sequence[Union[str, Callable]]], optional): reducers to compute.
+            Built-in or registered reducer names are vectorized; callables are applied per group.
+            Defaults to "auc".
+        aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
+        event_idx_col (Optional[str], optional): name of event index column. Defaults to "event_idx".
+        neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+        value_col (str, optional): name of value column. Defaults to "value".
+        created_window_col (str, optional): name of created window column. Defaults to "window".
+
+    Returns:
+        pd.DataFrame: one row per (event, neuron, window) with one column per reducer.
+    """
+    df_agg, _ = _window_agg_frame(
+        df_aligned_long,
+        windows=windows,
+        agg_funcs=agg_funcs,
+        aligned_time_col=aligned_time_col,
+        event_idx_col=event_idx_col,
+        neuron_col=neuron_col,
+        value_col=value_col,
+        created_window_col=created_window_col,
+    )
+    return df_agg
+
+
+def window_agg(
+    df_aligned_long: pd.DataFrame,
+    windows: Dict[str, Tuple[float, float]],
+    agg_funcs: Union[str, Callable, Sequence[Union[str, Callable]]] = "auc",
+    aligned_time_col: str = "aligned_time",
+    event_idx_col: Optional[str] = "event_idx",
+    neuron_col: str = "neuron",
+    value_col: str = "value",
+    sep: str = "_",
+) -> pd.DataFrame:
+    """
+    Aggregates aligned traces in several named windows with several reducers in one pass.
+
+    Wide counterpart of `window_agg_long`: one row per (event, neuron) and one
+    "<window><sep><reducer>" column per metric, ordered by window then reducer.
+
+    Args:
+        df_aligned_long (pd.DataFrame): long-format aligned dataframe
+        windows (Dict[str, Tuple[float, float]]): (start, stop) aligned times of each named window
+        agg_funcs (Union[str, Callable, Sequence[Union[str, Callable]]], optional): reducers to compute. Defaults to "auc".
+        aligned_time_col (str, optional): name of aligned time column. Defaults to "aligned_time".
+        event_idx_col (Optional[str], optional): name of event index column. Defaults to "event_idx".
+        neuron_col (str, optional): name of neuron column. Defaults to "neuron".
+        value_col (str, optional): name of value column. Defaults to "value".
+        sep (str, optional): separator between window and reducer names. Defaults to "_".
+
+    Returns:
+        pd.DataFrame: one row per (event, neuron) with one column per (window, reducer).
+    """
+    window_col = "window"
+    df_agg, agg_names = _window_agg_frame(
+        df_aligned_long,
+        windows=windows,
+        agg_funcs=agg_funcs,
+        aligned_time_col=aligned_time_col,
+        event_idx_col=event_idx_col,
+        neuron_col=neuron_col,
+        value_col=value_col,
+        created_window_col=window_col,
+    )
+    index_cols = list(df_agg.columns[:2])
+    df_wide = df_agg.pivot(index=index_cols, columns=window_col, values=agg_names)
+    columns = [(name, window) for window in windows for name in agg_names]
+    df_wide = df_wide.reindex(columns=pd.MultiIndex.from_tuples(columns))
+    df_wide.columns = [f"{window}{sep}{name}" for name, window in columns]
+    return df_wide.reset_index()